@@ -3,16 +3,38 @@
 # ================================================================
 # IMPORTS NECESSÁRIOS
 # ================================================================
-from flask import Flask, jsonify, request, send_from_directory
-from flask_socketio import SocketIO, emit
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.sql import func
+# O monkey patch vem antes de qualquer outro import: Flask, SQLAlchemy e o pool
+# de conexões precisam enxergar as versões cooperativas de socket, threading e time
+from gevent import monkey
+monkey.patch_all()
+
+import click
+from flask import Flask, Response, jsonify, request, send_from_directory
+from flask_socketio import SocketIO, emit, join_room, leave_room
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timedelta
+import logging
 import os
+import threading
+import time
 import gevent
-from gevent import monkey
-monkey.patch_all()
+
+from config import Config
+from database import db, estado_pool, iniciar_banco
+from models import Guiche, Senha, Servico
+from fila_engine import FilaEngine
+from sequencias import AlocadorSequencias, preparar_reset_diario
+from serializacao import SerializadorSenhas
+from cache_estado import CacheEstado
+from versao_fila import VersaoCompartilhada, VersaoLocal
+from arquivamento import Arquivador
+from estatisticas import DIMENSOES, GRANULARIDADES, RollupEstatisticas
+from estimativa_espera import EstimadorEspera
+from broker_local import GerenciadorBrokerLocal
+from metricas import Metricas
+import eventos
 
 # ================================================================
 # CONFIGURAÇÃO DO BANCO DE DADOS E EXTENSÕES (NÍVEL GLOBAL)
@@ -23,6 +45,28 @@ load_dotenv()
 # Instancia o aplicativo Flask, definindo a pasta de arquivos estáticos.
 # Esta pasta ('../frontend/dist') conterá o frontend React após o 'build'.
 app = Flask(__name__, static_folder='../frontend/dist', static_url_path='/')
+app.config.from_object(Config)
+
+# Logs dos módulos do app (erros das rotas, greenlets em segundo plano, requisições lentas).
+# Só os loggers do próprio app são configurados: o root e os das bibliotecas ficam como o
+# gunicorn ou o host deixaram. Se o root já tem handlers, os registros seguem para eles.
+LOGGERS_APP = ('app', 'arquivamento', 'broker_local', 'estatisticas', 'eventos', 'metricas')
+
+def configurar_logs(nivel):
+    root_configurado = bool(logging.getLogger().handlers)
+    for nome in LOGGERS_APP:
+        registro = logging.getLogger(nome)
+        registro.setLevel(nivel)
+        if not root_configurado and not registro.handlers:
+            saida = logging.StreamHandler()
+            saida.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(name)s] %(message)s'))
+            registro.addHandler(saida)
+            registro.propagate = False
+
+configurar_logs(app.config['LOG_LEVEL'])
+logger = logging.getLogger('app')
+# O acesso a cada requisição já sai no log do gunicorn
+logging.getLogger('geventwebsocket.handler').setLevel(logging.WARNING)
 
 # Configuração do banco de dados PostgreSQL
 # CORREÇÃO CRÍTICA: Substitui "postgres://" por "postgresql+psycopg2://" para compatibilidade com SQLAlchemy no Heroku.
@@ -32,70 +76,271 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL').replace("postg
 )
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-# Inicialização das extensões com o app
-db = SQLAlchemy(app)
+# Inicialização das extensões com o app. O `db` e os modelos ficam em database.py e
+# no pacote models; o pool de conexões é dimensionado pelas chaves DB_* da configuração.
+iniciar_banco(app)
 # CORS não é necessário quando o Flask serve o frontend do mesmo domínio.
-socketio = SocketIO(app)
+# Com SOCKETIO_MESSAGE_QUEUE (redis://, amqp://... ou local:// para o broker_local.py)
+# as emissões de qualquer worker chegam aos clientes conectados em todos os workers.
+fila_mensagens = app.config['SOCKETIO_MESSAGE_QUEUE']
+if fila_mensagens and fila_mensagens.startswith('local://'):
+    socketio = SocketIO(app, client_manager=GerenciadorBrokerLocal(fila_mensagens))
+else:
+    socketio = SocketIO(app, message_queue=fila_mensagens)
+# Vários workers: a versão da fila fica no banco e cada worker acompanha as mudanças dos outros
+versao_fila = VersaoCompartilhada(db) if app.config['FILA_MULTIPROCESSO'] else VersaoLocal()
+# As emissões saem da requisição: um greenlet junta as mudanças de cada janela numa única mensagem
+publicador = eventos.PublicadorEventos(
+    socketio, versao_fila,
+    emitir_legado=app.config['SOCKETIO_EVENTOS_LEGADOS'],
+    janela=app.config['SOCKETIO_JANELA_MS'] / 1000.0,
+    contexto=app.app_context,
+)
+# Instrumentação (GET /metrics): duração por rota, SQL por requisição, emissões e profundidade da fila
+metricas = Metricas(limite_lento_s=app.config['METRICAS_REQUISICAO_LENTA_MS'] / 1000.0,
+                    max_sql_log=app.config['METRICAS_SQL_NO_LOG'],
+                    amostra_bytes=app.config['METRICAS_AMOSTRA_BYTES'])
+if app.config['METRICAS_HABILITADAS']:
+    metricas.instrumentar(app, db)
+    publicador.ao_emitir = metricas.registrar_emissao
 
 # ================================================================
-# MODELOS DO BANCO DE DADOS
-# (Estes modelos estão incluídos diretamente aqui para garantir que o Heroku os encontre)
+# FILA EM MEMÓRIA
 # ================================================================
-
-class Servico(db.Model):
-    __tablename__ = 'servicos'
-    id_servico = db.Column(db.Integer, primary_key=True)
-    nome_servico = db.Column(db.String(100), nullable=False, unique=True)
-    prefixo_senha = db.Column(db.String(5), nullable=False)
-
-    def __repr__(self):
-        return f'<Servico {self.nome_servico}>'
-
-class Senha(db.Model):
-    __tablename__ = 'senhas'
-    id_senha = db.Column(db.Integer, primary_key=True)
-    id_servico = db.Column(db.Integer, db.ForeignKey('servicos.id_servico'), nullable=False)
-    numero_sequencial = db.Column(db.Integer, nullable=False)
-    prefixo = db.Column(db.String(5), nullable=False)
-    senha_completa = db.Column(db.String(20), nullable=False, unique=True)
-    status = db.Column(db.String(50), nullable=False, default='AGUARDANDO')
-    is_prioritaria = db.Column(db.Boolean, nullable=False, default=False)
-    data_hora_emissao = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    data_hora_chamada = db.Column(db.DateTime)
-    data_hora_fim_atendimento = db.Column(db.DateTime)
-    id_guiche_atendimento = db.Column(db.Integer)
-    id_atendente = db.Column(db.Integer)
-    localizacao = db.Column(db.String(255))
-
-    servico = db.relationship('Servico', backref=db.backref('senhas', lazy=True))
-
-    def to_dict(self):
-        return {
-            'id_senha': self.id_senha,
-            'numero_senha': self.senha_completa,
-            'servico': self.servico.nome_servico,
-            'is_prioritaria': self.is_prioritaria,
-            'status': self.status,
-            'data_hora_emissao': self.data_hora_emissao.isoformat() if self.data_hora_emissao else None,
-            'data_hora_chamada': self.data_hora_chamada.isoformat() if self.data_hora_chamada else None,
-            'guiche': self.id_guiche_atendimento,
-            'localizacao': self.localizacao
-        }
-
-class Guiche(db.Model):
-    __tablename__ = 'guiches'
-    id_guiche = db.Column(db.Integer, primary_key=True)
-    nome = db.Column(db.String(100), nullable=False)
-    descricao = db.Column(db.String(255))
-    is_disponivel = db.Column(db.Boolean, nullable=False, default=True)
-
-class Usuario(db.Model):
-    __tablename__ = 'usuarios'
-    id_usuario = db.Column(db.Integer, primary_key=True)
-    nome_completo = db.Column(db.String(100), nullable=False)
-    email = db.Column(db.String(100), nullable=False, unique=True)
-    senha = db.Column(db.String(255), nullable=False)
-    is_atendente = db.Column(db.Boolean, nullable=False, default=True)
+# A fila AGUARDANDO fica em memória (heap por prioridade/emissão) e é
+# reconstruída a partir do banco na primeira requisição do processo. Toda
+# rota que muda o status de uma senha atualiza a fila logo após o commit.
+fila_engine = FilaEngine()
+alocador = AlocadorSequencias(db, tamanho_bloco=app.config['SENHA_TAMANHO_BLOCO'], reset_diario=app.config['SENHA_RESET_DIARIO'])
+serializador = SerializadorSenhas(db, Senha, Servico)
+cache_estado = CacheEstado(max_entradas=app.config['ESTADO_CACHE_MAX_ENTRADAS'])
+# Senhas encerradas saem de `senhas` para `senhas_historico` periodicamente, em lotes
+arquivador = Arquivador(db, tamanho_lote=app.config['ARQUIVAMENTO_LOTE'],
+                        idade_minima=timedelta(hours=app.config['ARQUIVAMENTO_IDADE_HORAS']))
+# Estatísticas pré-agregadas, atualizadas a cada emissão, chamada e fim de atendimento
+estatisticas = RollupEstatisticas(db)
+# Espera estimada por serviço (totem e painel), atualizada a cada chamada e fim de atendimento
+estimador = EstimadorEspera(alfa=app.config['ESPERA_EWMA_ALFA'],
+                            duracao_padrao_s=app.config['ESPERA_DURACAO_PADRAO_S'],
+                            janela_guiche=timedelta(minutes=app.config['ESPERA_JANELA_GUICHE_MIN']))
+
+def _escopos_senha(senha):
+    # Salas com escopo que devem receber o evento desta senha
+    escopos = [f"servico:{serializador.id_servico(senha['servico'])}"]
+    if senha['guiche'] is not None:
+        escopos.append(f"guiche:{senha['guiche']}")
+    return escopos
+
+def _salas_remotas():
+    # Com vários workers, clientes de outros processos podem estar em qualquer sala:
+    # considera todos os painéis (gerais e de cada serviço e guichê cadastrado)
+    escopos = [eventos.ESCOPO_TODOS]
+    escopos += [f'servico:{id_servico}' for (id_servico,) in db.session.query(Servico.id_servico)]
+    escopos += [f'guiche:{id_guiche}' for (id_guiche,) in db.session.query(Guiche.id_guiche)]
+    return [f'{tipo}:{escopo}' for tipo in eventos.TIPOS_PAINEL for escopo in escopos]
+
+publicador.escopos_senha = _escopos_senha
+if versao_fila.compartilhada:
+    publicador.salas_remotas = _salas_remotas
+
+def _por_servico(valor):
+    # [((nome do serviço,), valor)] para os medidores de /metrics
+    return [((serializador.nome_servico(id_servico),), valor(id_servico)) for id_servico in serializador.ids_servico()]
+
+if app.config['METRICAS_HABILITADAS']:
+    metricas.medidor('fila_senhas_aguardando', 'Senhas aguardando na fila em memória',
+                     lambda: _por_servico(fila_engine.tamanho), ('servico',))
+    metricas.medidor('fila_senhas_prioritarias_aguardando', 'Senhas prioritárias aguardando na fila em memória',
+                     lambda: _por_servico(lambda i: fila_engine.tamanho(i, prioritarias=True)), ('servico',))
+    metricas.medidor('fila_espera_estimada_segundos', 'Espera estimada de uma senha comum emitida agora',
+                     lambda: _por_servico(lambda i: round(estimador.estimar(i, fila_engine.tamanho(i)), 1)), ('servico',))
+    metricas.medidor('fila_socketio_clientes', 'Clientes Socket.IO conectados neste processo',
+                     lambda: [((), publicador.metricas()['clientes'])])
+    metricas.medidor('fila_publicador_total', 'Contadores do publicador de eventos (ver /eventos/metricas)',
+                     lambda: [((nome,), valor) for nome, valor in publicador.metricas().items()
+                              if nome not in ('janela_ms', 'salas_inscritas', 'clientes')],
+                     ('contador',), tipo='counter')
+    metricas.medidor('fila_db_pool_conexoes', 'Conexões do pool do banco neste processo, por estado',
+                     lambda: [((estado,), valor) for estado, valor in estado_pool(db.engine).items()], ('estado',))
+
+def _entrada_fila(senha):
+    # Aceita tanto uma instância de Senha quanto uma linha de serializador.consultar
+    return (senha.id_senha, senha.id_servico, senha.is_prioritaria, senha.data_hora_emissao, serializador.para_dict(senha))
+
+def _campo_inteiro(data, campo, padrao=None):
+    """Valor inteiro de `campo` no corpo JSON (`padrao` quando ausente; sem padrão, o campo
+    é opcional). Levanta ValueError para outros tipos, antes de a rota mexer na fila ou no banco."""
+    if not isinstance(data, dict):
+        raise ValueError('O corpo da requisição deve ser um objeto JSON')
+    valor = data.get(campo, padrao)
+    if valor is None and padrao is None:
+        return None
+    if isinstance(valor, bool) or not isinstance(valor, (int, str)):
+        raise ValueError(f"'{campo}' deve ser um número inteiro")
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValueError(f"'{campo}' deve ser um número inteiro") from None
+
+def garantir_indices():
+    # create_all não cria índices novos em tabelas que já existem
+    for indice in Senha.__table__.indexes:
+        indice.create(db.engine, checkfirst=True)
+
+def carregar_fila():
+    # A versão é lida antes: o que mudar durante a carga é reaplicado na próxima sincronização
+    versao = versao_fila.atual() if versao_fila.compartilhada else None
+    linhas = serializador.consultar(Senha.status == 'AGUARDANDO')
+    fila_engine.carregar(_entrada_fila(linha) for linha in linhas)
+    if versao is not None:
+        versao_fila.marcar_aplicada(versao)
+
+def recarregar_fila():
+    # Reconstrução fora da carga inicial (reparo, chamada interrompida): os clientes e o
+    # snapshot de /estado em cache refletem a fila antiga e precisam ser avisados
+    carregar_fila()
+    publicador.ressincronizar(fila=fila_engine.listar)
+
+def aquecer_estimador(limite=500):
+    # Atendimentos recentes (ainda em `senhas`) dão ao estimador a duração média e os guichês ativos
+    linhas = serializador.consultar(Senha.status.in_(['CHAMANDO', 'ATENDIDA']),
+                                    ordem=(Senha.data_hora_chamada.desc(),), limite=limite)
+    for linha in reversed(linhas):
+        estimador.registrar_senha(linha)
+
+def _estimativas(ids_servico):
+    # Espera de uma senha comum emitida agora, por nome de serviço
+    return {serializador.nome_servico(id_servico): estimador.resumo(id_servico, fila_engine.tamanho(id_servico))
+            for id_servico in ids_servico}
+
+def sincronizar_fila():
+    """Aplica na fila em memória as mudanças publicadas por outros workers."""
+    novidades = versao_fila.novidades()
+    if novidades is None:
+        carregar_fila()
+        return
+    if not novidades:
+        return
+    ids = {id_senha for _, id_senha in novidades}
+    linhas = serializador.consultar(Senha.id_senha.in_(ids))
+    for linha in linhas:
+        if linha.status == 'AGUARDANDO':
+            fila_engine.adicionar(*_entrada_fila(linha))
+        else:
+            fila_engine.remover(linha.id_senha)
+        estimador.registrar_senha(linha)
+    for id_senha in ids - {linha.id_senha for linha in linhas}:
+        fila_engine.remover(id_senha)
+    versao_fila.marcar_aplicada(novidades[-1][0])
+
+# As primeiras requisições de um processo chegam juntas e, com o driver cooperativo,
+# cedem o processo umas às outras durante o DDL: a trava faz só a primeira inicializar
+_trava_inicializacao = threading.Lock()
+_tarefas_periodicas = []  # greenlets do arquivamento e das estatísticas, iniciados uma única vez
+
+def _iniciar_tarefas_periodicas():
+    if _tarefas_periodicas:
+        return
+    if app.config['ARQUIVAMENTO_INTERVALO_S'] > 0:
+        _tarefas_periodicas.append(socketio.start_background_task(
+            arquivador.executar_periodicamente, app.config['ARQUIVAMENTO_INTERVALO_S'], app.app_context))
+    if app.config['ESTATISTICAS_INTERVALO_S'] > 0:
+        _tarefas_periodicas.append(socketio.start_background_task(
+            estatisticas.executar_periodicamente, app.config['ESTATISTICAS_INTERVALO_S'], app.app_context))
+
+@app.before_request
+def inicializar_processo():
+    # Executado uma vez por processo (o Gunicorn não passa pelo bloco __main__)
+    if not fila_engine.carregada:
+        with _trava_inicializacao:
+            if fila_engine.carregada:
+                return  # outra requisição inicializou enquanto esta esperava a trava
+            db.create_all()
+            garantir_indices()
+            if alocador.reset_diario:
+                preparar_reset_diario(db)
+            arquivador.preparar()
+            carregar_fila()
+            aquecer_estimador()
+            _iniciar_tarefas_periodicas()
+    elif versao_fila.compartilhada:
+        sincronizar_fila()
+
+def _travar_proxima(id_servico=None):
+    """Retira a próxima senha da fila em memória e a trava no banco com
+    SELECT ... FOR UPDATE SKIP LOCKED. Se outro guichê (de outro processo) já
+    travou ou chamou a candidata, a seguinte é tentada; assim vários guichês
+    chamam em paralelo sem pegar a mesma senha. As candidatas puladas que
+    continuam AGUARDANDO voltam para a fila em memória."""
+    puladas = []
+    try:
+        while True:
+            candidata = fila_engine.retirar_proxima(id_servico)
+            if candidata is None:
+                break
+            try:
+                senha = (Senha.query.filter_by(id_senha=candidata[0], status='AGUARDANDO')
+                         .with_for_update(skip_locked=True).first())
+            except Exception:
+                puladas.append(candidata)
+                raise
+            if senha:
+                _devolver_puladas(puladas)
+                return senha
+            puladas.append(candidata)
+        # Fila em memória vazia (ou desatualizada): consulta direta no banco
+        consulta = Senha.query.filter_by(status='AGUARDANDO')
+        if id_servico is not None:
+            consulta = consulta.filter_by(id_servico=id_servico)
+        senha = (consulta.order_by(Senha.is_prioritaria.desc(), Senha.data_hora_emissao)
+                 .with_for_update(skip_locked=True).first())
+        _devolver_puladas(puladas)
+        return senha
+    except Exception:
+        # A transação falhou no meio: as candidatas retiradas voltam sem consultar o banco
+        # (as que não estiverem mais AGUARDANDO são puladas de novo na próxima chamada)
+        for candidata in puladas:
+            fila_engine.adicionar(*candidata)
+        raise
+
+def _devolver_puladas(puladas):
+    # Uma candidata travada por outra transação ainda em andamento continua AGUARDANDO
+    # para as demais: volta à fila (se a outra transação a chamar, a sincronização a remove)
+    if not puladas:
+        return
+    ids = [candidata[0] for candidata in puladas]
+    aguardando = {id_senha for (id_senha,) in db.session.query(Senha.id_senha)
+                  .filter(Senha.id_senha.in_(ids), Senha.status == 'AGUARDANDO')}
+    for candidata in puladas:
+        if candidata[0] in aguardando:
+            fila_engine.adicionar(*candidata)
+    puladas.clear()
+
+def _senhas_em_atendimento(id_guiche):
+    return (Senha.query.filter_by(status='CHAMANDO', id_guiche_atendimento=id_guiche)
+            .order_by(Senha.data_hora_chamada.desc()).with_for_update().all())
+
+def _registrar_estatisticas(emitidas=(), chamadas=(), finalizadas=()):
+    # Senhas (instâncias ou linhas) que acabaram de mudar de estado, já com o commit feito.
+    # O estimador de espera é atualizado na hora; as estatísticas, em lote.
+    for senha in finalizadas:
+        estimador.registrar_senha(senha)
+    for senha in chamadas:
+        estimador.registrar_senha(senha)
+    for senha in emitidas:
+        estatisticas.registrar_emissao(senha.id_servico, senha.data_hora_emissao)
+    for senha in chamadas:
+        estatisticas.registrar_chamada(senha.id_servico, senha.id_guiche_atendimento, senha.id_atendente,
+                                       senha.data_hora_emissao, senha.data_hora_chamada)
+    for senha in finalizadas:
+        estatisticas.registrar_fim(senha.id_servico, senha.id_guiche_atendimento, senha.id_atendente,
+                                   senha.data_hora_chamada, senha.data_hora_fim_atendimento)
+    # Sem o greenlet de gravação, os incrementos vão para o banco na própria requisição
+    if app.config['ESTATISTICAS_INTERVALO_S'] <= 0:
+        estatisticas.descarregar()
+
+def _ultimas_chamadas(status=('CHAMANDO', 'ATENDIDA'), filtros=()):
+    return serializador.listar(Senha.status.in_(status), *filtros, ordem=(Senha.data_hora_chamada.desc(),), limite=5)
 
 # ================================================================
 # ROTAS DO PROJETO - LÓGICA DO BACKEND
@@ -103,18 +348,93 @@ class Usuario(db.Model):
 @app.route('/estado', methods=['GET'])
 def get_estado():
     try:
-        fila_senhas_db = Senha.query.filter_by(status='AGUARDANDO').order_by(Senha.data_hora_emissao).all()
-        senhas_chamadas_db = Senha.query.filter(Senha.status.in_(['CHAMANDO', 'ATENDIDA'])).order_by(Senha.data_hora_chamada.desc()).limit(5).all()
-        senha_atual_db = Senha.query.filter_by(status='CHAMANDO').first()
-
-        return jsonify({
-            'fila': [s.to_dict() for s in fila_senhas_db],
-            'senha_atual': senha_atual_db.to_dict() if senha_atual_db else None,
-            'senhas_chamadas': [s.to_dict() for s in senhas_chamadas_db]
-        })
+        # A versão (seq) é lida antes das consultas: eventos com seq maior podem já
+        # estar refletidos no snapshot, e o cliente os aplica de forma idempotente.
+        seq = publicador.seq
+        # ?guiche=<id> devolve a senha em atendimento naquele guichê; sem ele, a última chamada.
+        # ?servico=<id> restringe a fila e as chamadas a um serviço (painéis inscritos numa sala de serviço).
+        guiche = request.args.get('guiche', type=int)
+        servico = request.args.get('servico', type=int)
+        chave = None if guiche is None and servico is None else f'guiche{guiche}-servico{servico}'
+        # As estimativas dependem do relógio (atendimento em curso, guichês que pararam de chamar),
+        # não só do seq: o snapshot e o ETag valem pelo seq dentro de uma janela de ESPERA_VALIDADE_S
+        versao = (seq, int(time.time() // app.config['ESPERA_VALIDADE_S']))
+        etag = CacheEstado.etag(publicador.epoca, versao, chave)
+
+        # Reconexões em massa dos painéis: se nada mudou, nem o corpo é enviado
+        if request.if_none_match.contains(etag):
+            resposta = Response(status=304)
+        else:
+            entrada = cache_estado.obter(chave, versao)
+            if entrada is None:
+                # O snapshot tem o mesmo escopo da sala do painel: a sala de um guichê só recebe
+                # os eventos das senhas atendidas nele (nenhuma senha aguardando é do guichê)
+                filtros_escopo = [Senha.id_servico == servico] if servico is not None else []
+                if guiche is not None:
+                    filtros_escopo.append(Senha.id_guiche_atendimento == guiche)
+                senha_atual = serializador.listar(Senha.status == 'CHAMANDO', *filtros_escopo,
+                                                  ordem=(Senha.data_hora_chamada.desc(),), limite=1)
+                corpo = app.json.dumps({
+                    'epoca': publicador.epoca,
+                    'seq': seq,
+                    'versao_protocolo': eventos.VERSAO_PROTOCOLO,
+                    'fila': [] if guiche is not None else fila_engine.listar(servico),
+                    'estimativas': _estimativas([servico] if servico is not None else serializador.ids_servico()),
+                    'senha_atual': senha_atual[0] if senha_atual else None,
+                    'senhas_chamadas': _ultimas_chamadas(filtros=filtros_escopo)
+                }).encode('utf-8')
+                entrada = cache_estado.guardar(chave, versao, etag, corpo)
+
+            corpo_gzip = cache_estado.corpo_gzip(entrada) if 'gzip' in request.accept_encodings else None
+            resposta = Response(corpo_gzip or entrada['corpo'], mimetype='application/json')
+            if corpo_gzip:
+                resposta.headers['Content-Encoding'] = 'gzip'
+        resposta.set_etag(etag)
+        resposta.headers['Cache-Control'] = 'no-cache'
+        resposta.headers['Vary'] = 'Accept-Encoding'
+        return resposta
     except Exception as e:
+        logger.exception('Erro em %s %s', request.method, request.path)
         return jsonify({'erro': f'Erro ao buscar o estado inicial: {str(e)}'}), 500
 
+def _obter_servico(servico_nome):
+    servico = Servico.query.filter_by(nome_servico=servico_nome).first()
+    if not servico:
+        # Caso o serviço não exista, crie um no banco de dados para evitar erros.
+        try:
+            servico = Servico(nome_servico=servico_nome, prefixo_senha=servico_nome[:1].upper())
+            db.session.add(servico)
+            db.session.commit()
+            serializador.registrar_servico(servico)
+            logger.info("Serviço '%s' não encontrado, mas foi criado.", servico_nome)
+        except IntegrityError:
+            # Outro totem criou o mesmo serviço ao mesmo tempo
+            db.session.rollback()
+            servico = Servico.query.filter_by(nome_servico=servico_nome).one()
+    return servico
+
+def _inserir_senhas(linhas):
+    """Grava as senhas num único INSERT de várias linhas e devolve (linhas do
+    serializador, {posição: erro}). Se o lote falhar (conflito, valor inválido),
+    grava uma a uma em savepoints, para que só as senhas com problema fiquem de fora."""
+    comando = insert(Senha).returning(*serializador.colunas, Senha.numero_sequencial)
+    try:
+        gravadas = db.session.execute(comando.values(linhas)).all()
+        db.session.commit()
+        return gravadas, {}
+    except SQLAlchemyError:
+        db.session.rollback()
+
+    gravadas, erros = [], {}
+    for posicao, linha in enumerate(linhas):
+        try:
+            with db.session.begin_nested():
+                gravadas.extend(db.session.execute(comando.values([linha])).all())
+        except SQLAlchemyError as e:
+            erros[posicao] = str(getattr(e, 'orig', None) or e)
+    db.session.commit()
+    return gravadas, erros
+
 @app.route('/gerar-senha', methods=['POST'])
 def gerar_senha_db():
     try:
@@ -126,16 +446,13 @@ def gerar_senha_db():
         if not servico_nome:
             return jsonify({'erro': 'Serviço não especificado'}), 400
 
-        servico = Servico.query.filter_by(nome_servico=servico_nome).first()
-        if not servico:
-            # Caso o serviço não exista, crie um no banco de dados para evitar erros.
-            servico = Servico(nome_servico=servico_nome, prefixo_senha=servico_nome[:1].upper())
-            db.session.add(servico)
-            db.session.commit()
-            print(f"Serviço '{servico_nome}' não encontrado, mas foi criado.")
+        servico = _obter_servico(servico_nome)
+        # A reserva do número usa uma conexão própria: a sessão devolve a sua ao pool
+        # antes, senão, com mais totens que conexões, todas ficam presas em requisições
+        # à espera de uma segunda conexão e o pool trava até o DB_POOL_TIMEOUT_S
+        db.session.commit()
 
-        ultimo_sequencial = db.session.query(func.max(Senha.numero_sequencial)).filter_by(id_servico=servico.id_servico).scalar()
-        proximo_sequencial = 1 if ultimo_sequencial is None else ultimo_sequencial + 1
+        proximo_sequencial = alocador.alocar(servico.id_servico)[0]
 
         prefixo = servico.prefixo_senha
         numero_senha_completa = f'{prefixo}-{proximo_sequencial:03d}'
@@ -151,69 +468,187 @@ def gerar_senha_db():
         )
         db.session.add(nova_senha)
         db.session.commit()
+        entrada = _entrada_fila(nova_senha)
+        fila_engine.adicionar(*entrada)
+        _registrar_estatisticas(emitidas=[nova_senha])
 
-        fila_senhas_db = Senha.query.filter_by(status='AGUARDANDO').order_by(Senha.data_hora_emissao).all()
-        socketio.emit('fila_atualizada', {'fila': [s.to_dict() for s in fila_senhas_db]})
+        publicador.publicar([(eventos.SENHA_ADICIONADA, entrada[-1])], fila=fila_engine.listar)
 
-        return jsonify({'mensagem': 'Senha gerada com sucesso', 'numero': numero_senha_completa}), 201
+        # Prioritárias passam à frente das comuns: contam só as prioritárias já na fila
+        a_frente = fila_engine.tamanho(servico.id_servico, prioritarias=bool(is_prioritaria)) - 1
+        return jsonify({
+            'mensagem': 'Senha gerada com sucesso',
+            'numero': numero_senha_completa,
+            'estimativa': estimador.resumo(servico.id_servico, a_frente),
+        }), 201
     
     except Exception as e:
+        logger.exception('Erro em %s %s', request.method, request.path)
         db.session.rollback()
         return jsonify({'erro': f'Ocorreu um erro ao gerar a senha: {str(e)}'}), 500
 
+@app.route('/gerar-senhas', methods=['POST'])
+def gerar_senhas_lote_db():
+    """Emite várias senhas de uma vez (famílias no totem, importação de agendamentos).
+
+    Corpo: {'senhas': [{'servico', 'prioritaria', 'localizacao'}, ...]}. Os números
+    são reservados de uma vez por serviço, as senhas entram num único INSERT e os
+    clientes recebem uma única mensagem de eventos. Um item inválido não impede os
+    demais: `resultados` traz, na ordem do pedido, o número gerado ou o erro.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        itens = data.get('senhas')
+        if not isinstance(itens, list) or not itens:
+            return jsonify({'erro': 'Lista de senhas não especificada'}), 400
+        if len(itens) > app.config['SENHA_LOTE_MAXIMO']:
+            return jsonify({'erro': f"O lote aceita no máximo {app.config['SENHA_LOTE_MAXIMO']} senhas"}), 400
+
+        resultados = [{'indice': indice} for indice in range(len(itens))]
+        indices_por_servico = {}
+        for indice, item in enumerate(itens):
+            servico_nome = item.get('servico') if isinstance(item, dict) else None
+            if not servico_nome:
+                resultados[indice]['erro'] = 'Serviço não especificado'
+            elif not isinstance(servico_nome, str):
+                resultados[indice]['erro'] = 'O serviço deve ser o nome (texto)'
+            else:
+                indices_por_servico.setdefault(servico_nome, []).append(indice)
+
+        servicos = {s.nome_servico: s for s in Servico.query.filter(Servico.nome_servico.in_(indices_por_servico))}
+        data_hora_emissao = datetime.utcnow()
+        linhas, indices_linhas = [], []
+        for servico_nome, indices in indices_por_servico.items():
+            servico = servicos.get(servico_nome) or _obter_servico(servico_nome)
+            db.session.commit()  # devolve a conexão antes da reserva (ver gerar_senha_db)
+            numeros = alocador.alocar(servico.id_servico, len(indices))
+            for indice, numero in zip(indices, numeros):
+                item = itens[indice]
+                linhas.append({
+                    'id_servico': servico.id_servico,
+                    'numero_sequencial': numero,
+                    'prefixo': servico.prefixo_senha,
+                    'senha_completa': f'{servico.prefixo_senha}-{numero:03d}',
+                    'status': 'AGUARDANDO',
+                    'is_prioritaria': bool(item.get('prioritaria', False)),
+                    'data_hora_emissao': data_hora_emissao,
+                    'localizacao': item.get('localizacao', 'Não especificado'),
+                })
+                indices_linhas.append(indice)
+
+        gravadas, erros = _inserir_senhas(linhas) if linhas else ([], {})
+        _registrar_estatisticas(emitidas=gravadas)
+        for posicao, erro in erros.items():
+            resultados[indices_linhas[posicao]]['erro'] = f'Não foi possível gravar a senha: {erro}'
+
+        # O prefixo pode se repetir entre serviços; (serviço, número) identifica a linha do lote
+        indice_por_numero = {(l['id_servico'], l['numero_sequencial']): indice for l, indice in zip(linhas, indices_linhas)}
+        entradas = []
+        for linha in sorted(gravadas, key=lambda l: l.id_senha):
+            entrada = _entrada_fila(linha)
+            fila_engine.adicionar(*entrada)
+            entradas.append(entrada)
+            indice = indice_por_numero[(linha.id_servico, linha.numero_sequencial)]
+            resultados[indice].update(numero=linha.senha_completa, id_senha=linha.id_senha)
+
+        if entradas:
+            publicador.publicar([(eventos.SENHA_ADICIONADA, entrada[-1]) for entrada in entradas], fila=fila_engine.listar)
+
+        return jsonify({
+            'mensagem': f'{len(entradas)} de {len(itens)} senhas geradas',
+            'resultados': resultados,
+        }), 201 if entradas else 400
+
+    except Exception as e:
+        logger.exception('Erro em %s %s', request.method, request.path)
+        db.session.rollback()
+        return jsonify({'erro': f'Ocorreu um erro ao gerar as senhas: {str(e)}'}), 500
+
 @app.route('/chamar-proxima', methods=['POST'])
 def chamar_proxima_db():
     try:
-        # Pega a próxima senha, dando prioridade a senhas prioritárias
-        senha_a_chamar = Senha.query.filter_by(status='AGUARDANDO').order_by(Senha.is_prioritaria.desc(), Senha.data_hora_emissao).first()
+        data = request.get_json(silent=True) or {}
+        id_guiche = _campo_inteiro(data, 'id_guiche', 1)
+        id_atendente = _campo_inteiro(data, 'id_atendente', 1)
+        # Opcional: guichê que atende apenas um serviço
+        id_servico = _campo_inteiro(data, 'id_servico')
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+
+    entrada = senha_dict = None
+    chamada_gravada = False
+    try:
+        # Pega a próxima senha, dando prioridade a senhas prioritárias, já travada para este guichê
+        senha_a_chamar = _travar_proxima(id_servico)
 
         if senha_a_chamar:
-            # Finaliza qualquer atendimento que estava em andamento
-            senha_anterior = Senha.query.filter_by(status='CHAMANDO').first()
-            if senha_anterior:
+            # Para devolver a senha à fila em memória se o commit não acontecer
+            entrada = _entrada_fila(senha_a_chamar)
+            # Finaliza o atendimento que estava em andamento neste guichê
+            senhas_anteriores = _senhas_em_atendimento(id_guiche)
+            for senha_anterior in senhas_anteriores:
                 senha_anterior.status = 'ATENDIDA'
                 senha_anterior.data_hora_fim_atendimento = datetime.utcnow()
-            
+
             senha_a_chamar.status = 'CHAMANDO'
-            senha_a_chamar.id_guiche_atendimento = 1 # ID do guichê fixo para exemplo
-            senha_a_chamar.id_atendente = 1 # ID do atendente fixo para exemplo
+            senha_a_chamar.id_guiche_atendimento = id_guiche
+            senha_a_chamar.id_atendente = id_atendente
             senha_a_chamar.data_hora_chamada = datetime.utcnow()
             db.session.commit()
-            
-            fila_senhas_db = Senha.query.filter_by(status='AGUARDANDO').order_by(Senha.data_hora_emissao).all()
-            senhas_chamadas_db = Senha.query.filter(Senha.status.in_(['CHAMANDO', 'ATENDIDA'])).order_by(Senha.data_hora_chamada.desc()).limit(5).all()
+            chamada_gravada = True
+            senha_dict = serializador.para_dict(senha_a_chamar)
+            _registrar_estatisticas(chamadas=[senha_a_chamar], finalizadas=senhas_anteriores)
 
-            socketio.emit('senha_chamada', {'senha_atual': senha_a_chamar.to_dict(), 'senhas_chamadas': [s.to_dict() for s in senhas_chamadas_db]})
-            socketio.emit('fila_atualizada', {'fila': [s.to_dict() for s in fila_senhas_db]})
+            publicador.publicar(
+                [(eventos.SENHA_FINALIZADA, serializador.para_dict(s)) for s in senhas_anteriores] + [(eventos.SENHA_CHAMADA, senha_dict)],
+                fila=fila_engine.listar,
+                senha_chamada=lambda: {'senha_atual': senha_dict, 'senhas_chamadas': _ultimas_chamadas()}
+            )
 
-            return jsonify({'mensagem': 'Próxima senha chamada', 'senha': senha_a_chamar.to_dict()})
+            return jsonify({'mensagem': 'Próxima senha chamada', 'senha': senha_dict})
         else:
             return jsonify({'mensagem': 'A fila está vazia'}), 404
     except Exception as e:
+        if chamada_gravada:
+            # A senha já está CHAMANDO no banco: o guichê precisa saber qual chamou, mesmo que
+            # as estatísticas ou a publicação (ex.: versão compartilhada) tenham falhado
+            logger.exception('Senha chamada, mas o pós-commit falhou em %s %s', request.method, request.path)
+            return jsonify({'mensagem': 'Próxima senha chamada', 'senha': senha_dict})
+        logger.exception('Erro em %s %s', request.method, request.path)
         db.session.rollback()
+        if entrada is not None:
+            # A senha saiu da fila em memória mas o commit não aconteceu: só ela volta
+            fila_engine.adicionar(*entrada)
         return jsonify({'erro': f'Ocorreu um erro ao chamar a próxima senha: {str(e)}'}), 500
 
 # Rota para finalizar um atendimento
 @app.route('/finalizar-atendimento', methods=['POST'])
 def finalizar_atendimento_db():
     try:
-        senha_atual_db = Senha.query.filter_by(status='CHAMANDO').first()
-        if senha_atual_db:
-            senha_atual_db.status = 'ATENDIDA'
-            senha_atual_db.data_hora_fim_atendimento = datetime.utcnow()
+        id_guiche = _campo_inteiro(request.get_json(silent=True) or {}, 'id_guiche', 1)
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    try:
+        senhas_atuais = _senhas_em_atendimento(id_guiche)
+        if senhas_atuais:
+            for senha_atual_db in senhas_atuais:
+                senha_atual_db.status = 'ATENDIDA'
+                senha_atual_db.data_hora_fim_atendimento = datetime.utcnow()
             db.session.commit()
+            _registrar_estatisticas(finalizadas=senhas_atuais)
 
-            fila_senhas_db = Senha.query.filter_by(status='AGUARDANDO').order_by(Senha.data_hora_emissao).all()
-            senhas_chamadas_db = Senha.query.filter(Senha.status.in_(['ATENDIDA'])).order_by(Senha.data_hora_chamada.desc()).limit(5).all()
-            
             # Emitir para os clientes a fila e senhas atualizadas
-            socketio.emit('senha_chamada', {'senha_atual': None, 'senhas_chamadas': [s.to_dict() for s in senhas_chamadas_db]})
-            socketio.emit('fila_atualizada', {'fila': [s.to_dict() for s in fila_senhas_db]})
+            publicador.publicar(
+                [(eventos.SENHA_FINALIZADA, serializador.para_dict(s)) for s in senhas_atuais],
+                fila=fila_engine.listar,
+                senha_chamada=lambda: {'senha_atual': None, 'senhas_chamadas': _ultimas_chamadas(('ATENDIDA',))}
+            )
 
             return jsonify({'mensagem': 'Atendimento finalizado com sucesso'})
         else:
             return jsonify({'mensagem': 'Nenhuma senha em atendimento'}), 404
     except Exception as e:
+        logger.exception('Erro em %s %s', request.method, request.path)
         db.session.rollback()
         return jsonify({'erro': f'Ocorreu um erro ao finalizar o atendimento: {str(e)}'}), 500
 
@@ -221,27 +656,135 @@ def finalizar_atendimento_db():
 @app.route('/reencaminhar-senha', methods=['POST'])
 def reencaminhar_senha_db():
     try:
-        senha_atual_db = Senha.query.filter_by(status='CHAMANDO').first()
-        if senha_atual_db:
+        id_guiche = _campo_inteiro(request.get_json(silent=True) or {}, 'id_guiche', 1)
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    try:
+        senhas_atuais = _senhas_em_atendimento(id_guiche)
+        if senhas_atuais:
+            senha_atual_db = senhas_atuais[0]
             senha_atual_db.status = 'AGUARDANDO'
             senha_atual_db.data_hora_chamada = None # Resetamos a data de chamada para reentrar na fila
             senha_atual_db.id_guiche_atendimento = None
             senha_atual_db.id_atendente = None
             db.session.commit()
-            
-            fila_senhas_db = Senha.query.filter_by(status='AGUARDANDO').order_by(Senha.data_hora_emissao).all()
-            senhas_chamadas_db = Senha.query.filter(Senha.status.in_(['CHAMANDO', 'ATENDIDA'])).order_by(Senha.data_hora_chamada.desc()).limit(5).all()
-            
-            socketio.emit('senha_chamada', {'senha_atual': None, 'senhas_chamadas': [s.to_dict() for s in senhas_chamadas_db]})
-            socketio.emit('fila_atualizada', {'fila': [s.to_dict() for s in fila_senhas_db]})
-            
+            estimador.liberar_guiche(id_guiche)
+            entrada = _entrada_fila(senha_atual_db)
+            fila_engine.adicionar(*entrada)
+
+            publicador.publicar(
+                [(eventos.SENHA_REENCAMINHADA, entrada[-1])],
+                fila=fila_engine.listar,
+                senha_chamada=lambda: {'senha_atual': None, 'senhas_chamadas': _ultimas_chamadas()},
+                guiche=id_guiche
+            )
+
             return jsonify({'mensagem': 'Senha reencaminhada para o final da fila'})
         else:
             return jsonify({'mensagem': 'Nenhuma senha em atendimento'}), 404
     except Exception as e:
+        logger.exception('Erro em %s %s', request.method, request.path)
         db.session.rollback()
         return jsonify({'erro': f'Ocorreu um erro ao reencaminhar a senha: {str(e)}'}), 500
 
+# Rota para conferir se a fila em memória bate com o banco
+@app.route('/fila/consistencia', methods=['GET'])
+def verificar_consistencia_fila():
+    try:
+        ids_banco = [id_senha for (id_senha,) in db.session.query(Senha.id_senha).filter_by(status='AGUARDANDO')]
+        relatorio = fila_engine.verificar_consistencia(ids_banco)
+        # ?reparar=1 reconstrói a fila a partir do banco quando houver divergência
+        if not relatorio['consistente'] and request.args.get('reparar') in ('1', 'true'):
+            recarregar_fila()
+            relatorio['reparada'] = True
+        return jsonify(relatorio)
+    except Exception as e:
+        logger.exception('Erro em %s %s', request.method, request.path)
+        return jsonify({'erro': f'Erro ao verificar a fila: {str(e)}'}), 500
+
+# Estatísticas de espera e atendimento, lidas só das tabelas pré-agregadas
+@app.route('/estatisticas', methods=['GET'])
+def get_estatisticas():
+    """?granularidade=5min|dia (padrão dia) &dimensao=geral|servico|guiche|atendente (padrão geral)
+    &id=<id> &de=<ISO> &ate=<ISO> &agregar=1 (um resultado por id para o período todo)."""
+    try:
+        granularidade = request.args.get('granularidade', 'dia')
+        dimensao = request.args.get('dimensao', 'geral')
+        if granularidade not in GRANULARIDADES or dimensao not in DIMENSOES:
+            return jsonify({'erro': 'Granularidade ou dimensão inválida'}), 400
+        ate = datetime.fromisoformat(request.args['ate']) if 'ate' in request.args else datetime.utcnow()
+        # Sem 'de': últimas 24 horas em baldes de 5 minutos, últimos 30 dias em baldes diários
+        padrao = timedelta(days=1) if granularidade == '5min' else timedelta(days=30)
+        de = datetime.fromisoformat(request.args['de']) if 'de' in request.args else ate - padrao
+    except ValueError:
+        return jsonify({'erro': 'Datas devem estar no formato ISO (ex.: 2024-05-01T08:00)'}), 400
+    try:
+        resultados = estatisticas.consultar(granularidade, dimensao, de, ate,
+                                            id_dimensao=request.args.get('id', type=int),
+                                            agregar=request.args.get('agregar') in ('1', 'true'))
+        return jsonify({'granularidade': granularidade, 'dimensao': dimensao,
+                        'de': de.isoformat(), 'ate': ate.isoformat(), 'resultados': resultados})
+    except Exception as e:
+        logger.exception('Erro em %s %s', request.method, request.path)
+        return jsonify({'erro': f'Erro ao consultar as estatísticas: {str(e)}'}), 500
+
+# Rota com os contadores do emissor de eventos (publicações juntadas vs. mensagens emitidas)
+@app.route('/eventos/metricas', methods=['GET'])
+def metricas_eventos():
+    return jsonify(publicador.metricas())
+
+
+# Arquivamento manual (ex.: para colocar um banco antigo em dia): flask --app app arquivar-senhas
+@app.cli.command('arquivar-senhas')
+def arquivar_senhas_cli():
+    db.create_all()
+    arquivador.preparar()
+    click.echo(f'{arquivador.arquivar()} senhas movidas para o histórico.')
+
+# Recálculo das estatísticas a partir das senhas (vivas e arquivadas); a última hora
+# fica de fora (os workers ainda podem ter incrementos dela na memória). Sobre todo o
+# histórico, desligue o statement_timeout das conexões:
+#   DB_STATEMENT_TIMEOUT_MS=0 flask --app app recalcular-estatisticas --desde 2024-01-01
+@app.cli.command('recalcular-estatisticas')
+@click.option('--desde', default=None, help='Data inicial (AAAA-MM-DD); padrão: todo o histórico')
+def recalcular_estatisticas_cli(desde):
+    db.create_all()
+    arquivador.preparar()
+    inicio = datetime.fromisoformat(desde) if desde else datetime(2000, 1, 1)
+    click.echo(f'{estatisticas.recalcular(inicio)} senhas lidas; estatísticas recalculadas desde {inicio:%Y-%m-%d}.')
+
+
+# ================================================================
+# SALAS DO SOCKET.IO
+# ================================================================
+# Todo cliente começa na sala padrão (recebe tudo, como antes). Painéis que
+# mostram só um serviço ou um guichê enviam 'inscrever' e passam a receber
+# apenas os eventos do seu escopo.
+@socketio.on('connect')
+def conectar_cliente():
+    join_room(eventos.SALA_PADRAO)
+    publicador.inscrever(request.sid, eventos.SALA_PADRAO)
+
+@socketio.on('disconnect')
+def desconectar_cliente():
+    publicador.cancelar_inscricao(request.sid)
+
+@socketio.on('inscrever')
+def inscrever_painel(data):
+    """Handshake: {'tipo': 'totem'|'monitor'|'atendente', 'servico': id?, 'guiche': id?}.
+    Responde (ack) com o nome da sala, ou com 'erro'."""
+    data = data or {}
+    try:
+        sala = eventos.nome_sala(data.get('tipo', 'monitor'), data.get('servico'), data.get('guiche'))
+    except (TypeError, ValueError) as e:
+        return {'erro': str(e)}
+    for sala_atual in socketio.server.rooms(request.sid):
+        if sala_atual != request.sid:
+            leave_room(sala_atual)
+    join_room(sala)
+    publicador.inscrever(request.sid, sala)
+    return {'sala': sala}
+
 
 # ================================================================
 # ROTA PARA SERVIR O FRONTEND
@@ -271,7 +814,7 @@ if __name__ == '__main__':
             db.session.add(servico1)
             db.session.add(servico2)
             db.session.commit()
-            print("Serviços iniciais adicionados ao banco de dados.")
+            logger.info("Serviços iniciais adicionados ao banco de dados.")
 
         if not Guiche.query.first():
             guiche1 = Guiche(nome='Guichê 1', descricao='Guichê de Atendimento Principal')
@@ -279,7 +822,7 @@ if __name__ == '__main__':
             db.session.add(guiche1)
             db.session.add(guiche2)
             db.session.commit()
-            print("Guichês iniciais adicionados ao banco de dados.")
+            logger.info("Guichês iniciais adicionados ao banco de dados.")
 
     # Inicia o servidor Socket.IO
     # No Heroku, o Gunicorn vai gerenciar a porta, então não precisamos especificar aqui.
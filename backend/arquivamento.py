@@ -0,0 +1,132 @@
+# backend/arquivamento.py
+import logging
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, text
+
+logger = logging.getLogger(__name__)
+
+STATUS_ENCERRADOS = ('ATENDIDA', 'CANCELADA')
+
+# Colunas copiadas de `senhas` para `senhas_historico` (e expostas na view de relatório)
+COLUNAS = (
+    'id_senha', 'id_servico', 'numero_sequencial', 'prefixo', 'senha_completa', 'status', 'is_prioritaria',
+    'data_hora_emissao', 'data_hora_chamada', 'data_hora_fim_atendimento', 'id_guiche_atendimento',
+    'id_atendente', 'localizacao',
+)
+
+# Relatórios consultam esta view, que junta as senhas vivas e as arquivadas
+VIEW_RELATORIO = 'senhas_relatorio'
+
+
+class Arquivador:
+    """Move senhas encerradas de `senhas` para `senhas_historico` em lotes pequenos.
+
+    Cada lote é uma transação curta: trava até `tamanho_lote` senhas encerradas e
+    emitidas há mais de `idade_minima` (com SKIP LOCKED no PostgreSQL, então não
+    espera por linhas em uso e pode rodar em vários workers ao mesmo tempo),
+    copia para o histórico e apaga de `senhas`. Assim `senhas` guarda só as
+    linhas vivas e as recentes, e seus índices e a unicidade de `senha_completa`
+    não crescem com o tempo.
+    """
+
+    def __init__(self, db, tamanho_lote=1000, idade_minima=timedelta(hours=24), pausa=0.05):
+        self.db = db
+        self.tamanho_lote = tamanho_lote
+        self.idade_minima = idade_minima
+        self.pausa = pausa
+        self._particoes = set()
+        self._colunas = ', '.join(COLUNAS)
+
+    @property
+    def _postgres(self):
+        return self.db.engine.dialect.name == 'postgresql'
+
+    def preparar(self):
+        """Cria (ou atualiza) a view de relatório."""
+        consulta = (
+            f"SELECT {self._colunas}, FALSE AS arquivada FROM senhas "
+            f"UNION ALL SELECT {self._colunas}, TRUE AS arquivada FROM senhas_historico"
+        )
+        with self.db.engine.begin() as conexao:
+            if self._postgres:
+                conexao.execute(text(f"CREATE OR REPLACE VIEW {VIEW_RELATORIO} AS {consulta}"))
+            else:
+                conexao.execute(text(f"DROP VIEW IF EXISTS {VIEW_RELATORIO}"))
+                conexao.execute(text(f"CREATE VIEW {VIEW_RELATORIO} AS {consulta}"))
+
+    def _garantir_particoes(self, conexao, inicio, fim):
+        # Uma partição por mês de emissão, criada na primeira vez que o mês é arquivado
+        mes = inicio.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        while mes <= fim:
+            proximo = (mes + timedelta(days=32)).replace(day=1)
+            nome = f'senhas_historico_{mes:%Y_%m}'
+            if nome not in self._particoes:
+                conexao.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {nome} PARTITION OF senhas_historico "
+                    f"FOR VALUES FROM ('{mes:%Y-%m-%d}') TO ('{proximo:%Y-%m-%d}')"
+                ))
+                self._particoes.add(nome)
+            mes = proximo
+
+    def arquivar_lote(self):
+        """Arquiva um lote e devolve quantas senhas foram movidas."""
+        selecao = (
+            "SELECT id_senha, data_hora_emissao FROM senhas "
+            "WHERE status IN :encerrados AND data_hora_emissao < :limite "
+            "ORDER BY id_senha LIMIT :lote"
+        )
+        if self._postgres:
+            selecao += " FOR UPDATE SKIP LOCKED"
+        parametros = {
+            'encerrados': STATUS_ENCERRADOS,
+            'limite': datetime.utcnow() - self.idade_minima,
+            'lote': self.tamanho_lote,
+        }
+        with self.db.engine.begin() as conexao:
+            linhas = conexao.execute(
+                text(selecao).bindparams(bindparam('encerrados', expanding=True)), parametros
+            ).all()
+            if not linhas:
+                return 0
+            ids = [id_senha for id_senha, _ in linhas]
+            if self._postgres:
+                emissoes = [emissao for _, emissao in linhas]
+                self._garantir_particoes(conexao, min(emissoes), max(emissoes))
+            conexao.execute(text(
+                f"INSERT INTO senhas_historico ({self._colunas}, data_hora_arquivamento) "
+                f"SELECT {self._colunas}, :agora FROM senhas WHERE id_senha IN :ids"
+            ).bindparams(bindparam('ids', expanding=True)), {'ids': ids, 'agora': datetime.utcnow()})
+            conexao.execute(text(
+                "DELETE FROM senhas WHERE id_senha IN :ids"
+            ).bindparams(bindparam('ids', expanding=True)), {'ids': ids})
+        return len(ids)
+
+    def arquivar(self, max_lotes=None):
+        """Arquiva lotes até não sobrar nada elegível (ou até `max_lotes`).
+
+        Entre um lote e outro dorme `pausa` segundos, cedendo o processo (e o
+        banco) às requisições da fila.
+        """
+        total, lotes = 0, 0
+        while max_lotes is None or lotes < max_lotes:
+            movidas = self.arquivar_lote()
+            total += movidas
+            lotes += 1
+            if movidas < self.tamanho_lote:
+                break
+            time.sleep(self.pausa)
+        return total
+
+    def executar_periodicamente(self, intervalo, contexto):
+        """Laço do greenlet de arquivamento: um ciclo a cada `intervalo` segundos."""
+        while True:
+            time.sleep(intervalo)
+            try:
+                with contexto():
+                    movidas = self.arquivar()
+                if movidas:
+                    logger.info('Arquivamento: %d senhas movidas para o histórico.', movidas)
+            except Exception:
+                logger.exception('Erro no arquivamento de senhas')
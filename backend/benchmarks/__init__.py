@@ -0,0 +1,3 @@
+# backend/benchmarks/__init__.py
+# Scripts de carga e benchmark. Execute a partir da pasta backend, por exemplo:
+#   python -m benchmarks.carga_emissao_senhas
@@ -0,0 +1,128 @@
+# backend/benchmarks/_paineis.py
+"""Processo auxiliar do carga_diaria: mantém vários painéis Socket.IO conectados.
+
+Conecta `--quantidade` clientes na sala padrão de `--url` (cada um buscando
+/estado, como um painel ao abrir) e escreve uma linha JSON com o resultado da
+conexão. Depois lê do stdin uma linha JSON {'seq_inicial', 'seq_final',
+'espera'}, aguarda os eventos que faltam e escreve o resumo da entrega. Os
+atrasos voltam como amostra (no máximo AMOSTRA valores por lista).
+
+    python -m benchmarks._paineis --url http://127.0.0.1:5201 --quantidade 250
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import logging  # noqa: E402
+import os  # noqa: E402
+import random  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+from datetime import datetime, timezone  # noqa: E402
+
+AMOSTRA = 20000
+
+# Data da mudança que originou cada tipo de evento
+_MOMENTO_EVENTO = {'senha_adicionada': 'data_hora_emissao', 'senha_chamada': 'data_hora_chamada'}
+
+
+def _segundos_desde(iso, agora):
+    # As datas das senhas são UTC sem fuso
+    return agora - datetime.fromisoformat(iso).replace(tzinfo=timezone.utc).timestamp()
+
+
+class Painel:
+    """Cliente Socket.IO na sala padrão, guardando os números e atrasos recebidos."""
+
+    def __init__(self, socketio_cliente):
+        self.cliente = socketio_cliente
+        self.seqs = set()
+        self.mensagens = 0
+        self.atrasos_emissao = []
+        self.atrasos_mudanca = []
+        self.cliente.on('fila_eventos', self._receber)
+
+    def _receber(self, dados):
+        agora = time.time()
+        self.mensagens += 1
+        if 'emitido_em' in dados:
+            self.atrasos_emissao.append(agora - dados['emitido_em'])
+        for evento in dados['eventos']:
+            self.seqs.add(evento['seq'])
+            momento = (evento['senha'] or {}).get(_MOMENTO_EVENTO.get(evento['tipo']))
+            if momento:
+                self.atrasos_mudanca.append(_segundos_desde(momento, agora))
+        self.seqs.update(dados.get('ignorados', ()))
+
+
+def _amostra(valores):
+    return valores if len(valores) <= AMOSTRA else random.sample(valores, AMOSTRA)
+
+
+def _escrever(dados):
+    sys.stdout.write(json.dumps(dados) + '\n')
+    sys.stdout.flush()
+
+
+def _ler_ordem():
+    # O select do gevent cede o processo aos clientes enquanto espera o stdin
+    import select
+    while not select.select([sys.stdin], [], [], 0.5)[0]:
+        pass
+    return json.loads(sys.stdin.readline())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', required=True)
+    parser.add_argument('--quantidade', type=int, required=True)
+    args = parser.parse_args()
+
+    import gevent
+    import requests
+    import socketio
+    from gevent.pool import Pool
+
+    # Os clientes reclamam da conexão encerrada quando o servidor sai primeiro
+    logging.getLogger('engineio.client').setLevel(logging.CRITICAL)
+    logging.getLogger('socketio.client').setLevel(logging.CRITICAL)
+
+    sessao = requests.Session()
+    sessao.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=50))
+    paineis, falhas, latencias_estado = [], [], []
+
+    def conectar(_):
+        try:
+            with gevent.Timeout(15):
+                painel = Painel(socketio.Client(reconnection=False))
+                painel.cliente.connect(args.url, transports=['websocket'])
+                inicio = time.perf_counter()
+                sessao.get(f'{args.url}/estado', timeout=30).raise_for_status()
+                latencias_estado.append(time.perf_counter() - inicio)
+            paineis.append(painel)
+        except (Exception, gevent.Timeout) as e:
+            falhas.append(repr(e))
+
+    Pool(50).map(conectar, range(args.quantidade))
+    _escrever({'conectados': len(paineis), 'falhas': falhas[:5], 'quantidade_falhas': len(falhas),
+               'latencias_estado': latencias_estado})
+
+    ordem = _ler_ordem()
+    esperados = set(range(ordem['seq_inicial'] + 1, ordem['seq_final'] + 1))
+    limite = time.monotonic() + ordem['espera']
+    while time.monotonic() < limite and any(not esperados <= p.seqs for p in paineis):
+        time.sleep(0.1)
+    _escrever({
+        'com_eventos_faltando': sum(1 for p in paineis if not esperados <= p.seqs),
+        'mensagens': sum(p.mensagens for p in paineis),
+        'atraso_emissao': _amostra([a for p in paineis for a in p.atrasos_emissao]),
+        'atraso_mudanca': _amostra([a for p in paineis for a in p.atrasos_mudanca]),
+    })
+    # Sai sem desconectar: com o gevent, o fechamento do WebSocket pelo cliente
+    # pode ficar esperando a resposta do servidor indefinidamente
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# backend/benchmarks/_servidor.py
+"""Sobe um worker do app numa porta, para os harnesses com vários processos.
+
+Com `--contar-consultas`, conta os comandos SQL de cada requisição por rota e
+os expõe em GET /_benchmark/consultas (?zerar=1 zera os contadores).
+
+    python -m benchmarks._servidor --porta 5101
+"""
+import argparse
+import threading
+
+import benchmarks._comum  # noqa: F401  (DATABASE_URL padrão e sys.path)
+
+
+def instalar_contador_consultas(app, db):
+    from flask import g, has_request_context, jsonify, request
+    from sqlalchemy import event
+
+    lock = threading.Lock()
+    por_rota = {}  # rota -> {'requisicoes', 'consultas', 'max'}
+    fundo = {'consultas': 0}  # greenlets em segundo plano (emissor, estatísticas, arquivamento)
+
+    def contar(*_):
+        if has_request_context():
+            g.consultas_benchmark = g.get('consultas_benchmark', 0) + 1
+        else:
+            with lock:
+                fundo['consultas'] += 1
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', contar)
+
+    @app.after_request
+    def registrar_consultas(resposta):
+        rota = f"{request.method} {request.url_rule.rule if request.url_rule else '?'}"
+        quantidade = g.get('consultas_benchmark', 0)
+        with lock:
+            atual = por_rota.setdefault(rota, {'requisicoes': 0, 'consultas': 0, 'max': 0})
+            atual['requisicoes'] += 1
+            atual['consultas'] += quantidade
+            atual['max'] = max(atual['max'], quantidade)
+        return resposta
+
+    @app.route('/_benchmark/consultas')
+    def consultas_benchmark():
+        with lock:
+            resultado = {'rotas': {rota: dict(v) for rota, v in por_rota.items()}, 'fundo': fundo['consultas']}
+            if request.args.get('zerar') in ('1', 'true'):
+                por_rota.clear()
+                fundo['consultas'] = 0
+        return jsonify(resultado)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, required=True)
+    parser.add_argument('--contar-consultas', action='store_true')
+    args = parser.parse_args()
+
+    from app import app, db, socketio
+    if args.contar_consultas:
+        instalar_contador_consultas(app, db)
+    socketio.run(app, host=args.host, port=args.porta, log_output=False)
+
+
+if __name__ == '__main__':
+    main()
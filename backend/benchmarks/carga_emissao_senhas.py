@@ -0,0 +1,79 @@
+# backend/benchmarks/carga_emissao_senhas.py
+"""Teste de carga da emissão de senhas com vários totens simultâneos.
+
+Dispara `--totens` greenlets chamando /gerar-senha ao mesmo tempo e, no fim,
+confere no banco que nenhuma senha saiu duplicada e que nenhuma emissão falhou.
+Sai com código 1 se encontrar qualquer um dos dois problemas. Com `--lote N`
+cada totem pede N senhas por chamada em /gerar-senhas.
+
+    python -m benchmarks.carga_emissao_senhas --totens 50 --senhas-por-totem 40
+    python -m benchmarks.carga_emissao_senhas --totens 50 --senhas-por-totem 40 --lote 10
+"""
+import argparse
+import sys
+import time
+
+from benchmarks._comum import carregar_app, resumo_latencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--totens', type=int, default=50)
+    parser.add_argument('--senhas-por-totem', type=int, default=40)
+    parser.add_argument('--servicos', type=int, default=2)
+    parser.add_argument('--lote', type=int, default=1, help='senhas por requisição (> 1 usa /gerar-senhas)')
+    args = parser.parse_args()
+
+    modulo_app = carregar_app()
+    from gevent.pool import Pool
+    from sqlalchemy import func
+
+    app, db, Senha = modulo_app.app, modulo_app.db, modulo_app.Senha
+    cliente = app.test_client()
+    latencias, falhas = [], []
+
+    def servico(indice, n):
+        # O prefixo da senha é a inicial do serviço, então cada serviço usa uma letra
+        return f'{chr(ord("A") + (indice + n) % args.servicos)} Servico'
+
+    def totem(indice):
+        for n in range(0, args.senhas_por_totem, args.lote):
+            quantidade = min(args.lote, args.senhas_por_totem - n)
+            inicio = time.perf_counter()
+            if args.lote == 1:
+                resposta = cliente.post('/gerar-senha', json={'servico': servico(indice, n), 'localizacao': f'Totem {indice}'})
+            else:
+                resposta = cliente.post('/gerar-senhas', json={'senhas': [
+                    {'servico': servico(indice, n + i), 'localizacao': f'Totem {indice}'} for i in range(quantidade)
+                ]})
+            latencias.append(time.perf_counter() - inicio)
+            if resposta.status_code != 201:
+                falhas.append((resposta.status_code, resposta.get_json()))
+            elif args.lote > 1:
+                falhas.extend((201, r) for r in resposta.get_json()['resultados'] if 'erro' in r)
+
+    inicio = time.perf_counter()
+    pool = Pool(args.totens)
+    for indice in range(args.totens):
+        pool.spawn(totem, indice)
+    pool.join()
+    duracao = time.perf_counter() - inicio
+
+    with app.app_context():
+        total = db.session.query(func.count(Senha.id_senha)).scalar()
+        duplicadas = db.session.query(Senha.id_servico, Senha.numero_sequencial).group_by(
+            Senha.id_servico, Senha.numero_sequencial).having(func.count() > 1).count()
+        banco = db.engine.url.get_backend_name()
+
+    esperadas = args.totens * args.senhas_por_totem
+    print(f'Banco: {banco}')
+    print(f'Emissões: {esperadas} em {duracao:.2f}s ({esperadas / duracao:.1f}/s)')
+    print(f'Latência: {resumo_latencias(latencias)}')
+    print(f'Senhas gravadas: {total} | duplicadas: {duplicadas} | falhas: {len(falhas)}')
+    for status, corpo in falhas[:5]:
+        print(f'  {status}: {corpo}')
+    return 1 if duplicadas or falhas or total != esperadas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+# backend/benchmarks/chamar_proxima_concorrente.py
+"""Benchmark de vários guichês chamando a próxima senha ao mesmo tempo.
+
+Cria `--senhas` senhas aguardando e solta `--guiches` guichês simulados, cada
+um chamando /chamar-proxima (com seu próprio id_guiche) até a fila esvaziar.
+Informa a vazão e quantas senhas foram entregues a mais de um guichê; sai com
+código 1 se houver alguma atribuição dupla ou senha não chamada.
+
+    python -m benchmarks.chamar_proxima_concorrente --guiches 20 --senhas 2000
+"""
+import argparse
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from benchmarks._comum import carregar_app, resumo_latencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--guiches', type=int, default=20)
+    parser.add_argument('--senhas', type=int, default=2000)
+    args = parser.parse_args()
+
+    modulo_app = carregar_app()
+    from gevent.pool import Pool
+
+    app, db, Senha, Servico = modulo_app.app, modulo_app.db, modulo_app.Senha, modulo_app.Servico
+    with app.app_context():
+        servico = Servico(nome_servico='Atendimento Geral', prefixo_senha='A')
+        db.session.add(servico)
+        db.session.flush()
+        inicio_emissao = datetime.utcnow() - timedelta(hours=1)
+        db.session.add_all([
+            Senha(id_servico=servico.id_servico, numero_sequencial=n, prefixo='A', senha_completa=f'A-{n:03d}',
+                  is_prioritaria=(n % 10 == 0), data_hora_emissao=inicio_emissao + timedelta(milliseconds=n))
+            for n in range(1, args.senhas + 1)
+        ])
+        db.session.commit()
+
+    cliente = app.test_client()
+    chamadas, latencias, erros = [], [], []
+
+    def guiche(id_guiche):
+        while True:
+            inicio = time.perf_counter()
+            resposta = cliente.post('/chamar-proxima', json={'id_guiche': id_guiche, 'id_atendente': id_guiche})
+            latencias.append(time.perf_counter() - inicio)
+            if resposta.status_code == 404:
+                return
+            if resposta.status_code != 200:
+                erros.append(resposta.get_json())
+                return
+            chamadas.append((resposta.get_json()['senha']['id_senha'], id_guiche))
+
+    inicio = time.perf_counter()
+    pool = Pool(args.guiches)
+    for id_guiche in range(1, args.guiches + 1):
+        pool.spawn(guiche, id_guiche)
+    pool.join()
+    duracao = time.perf_counter() - inicio
+
+    repetidas = sum(1 for _, vezes in Counter(id_senha for id_senha, _ in chamadas).items() if vezes > 1)
+    with app.app_context():
+        restantes = Senha.query.filter_by(status='AGUARDANDO').count()
+        banco = db.engine.url.get_backend_name()
+
+    print(f'Banco: {banco} | guichês: {args.guiches} | senhas: {args.senhas}')
+    print(f'Chamadas: {len(chamadas)} em {duracao:.2f}s ({len(chamadas) / duracao:.1f}/s)')
+    print(f'Latência: {resumo_latencias(latencias)}')
+    print(f'Atribuições duplas: {repetidas} | não chamadas: {restantes} | erros: {len(erros)}')
+    for erro in erros[:5]:
+        print(f'  {erro}')
+    return 1 if repetidas or restantes or erros else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+# backend/benchmarks/multiprocesso.py
+"""Harness com vários workers: entrega dos eventos e vazão por número de processos.
+
+Sobe o broker_local.py e, para cada quantidade de workers em `--workers`, recria
+o banco, inicia os processos (cada um na sua porta, com FILA_MULTIPROCESSO=1 e
+SOCKETIO_MESSAGE_QUEUE=local://...), conecta clientes Socket.IO distribuídos
+entre eles e emite senhas alternando o worker a cada requisição. Confere que
+todo cliente recebeu cada evento (epoca, seq) exatamente uma vez, qualquer que
+seja o worker que o publicou. Sai com código 1 se algum evento faltar ou repetir.
+
+Requer o cliente do python-socketio (pip install requests websocket-client).
+
+    python -m benchmarks.multiprocesso --workers 1 2 4 --senhas 300
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from benchmarks._comum import carregar_app, resumo_latencias
+
+DIRETORIO_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def aguardar_worker(sessao, url, processo, limite_s=30):
+    fim = time.monotonic() + limite_s
+    while time.monotonic() < fim:
+        if processo.poll() is not None:
+            raise RuntimeError(f'Worker {url} terminou com código {processo.returncode}')
+        try:
+            if sessao.get(f'{url}/estado', timeout=1).status_code == 200:
+                return
+        except Exception:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'Worker {url} não respondeu em {limite_s}s')
+
+
+def rodada(args, quantidade, ambiente):
+    import requests
+    import socketio
+    from gevent.pool import Pool
+
+    carregar_app()  # banco novo: seq recomeça em 1 numa época nova
+    portas = [args.porta_base + i for i in range(quantidade)]
+    urls = [f'http://127.0.0.1:{porta}' for porta in portas]
+    processos = [
+        subprocess.Popen([sys.executable, '-m', 'benchmarks._servidor', '--porta', str(porta)],
+                         cwd=DIRETORIO_BACKEND, env=ambiente)
+        for porta in portas
+    ]
+    clientes = []
+    try:
+        sessao = requests.Session()
+        for url, processo in zip(urls, processos):
+            aguardar_worker(sessao, url, processo)
+
+        recebidos = []
+        for i in range(args.clientes):
+            eventos_cliente = []
+            cliente = socketio.Client()
+            cliente.on('fila_eventos', lambda dados, destino=eventos_cliente: destino.extend(
+                (dados['epoca'], evento['seq']) for evento in dados['eventos']))
+            cliente.connect(urls[i % quantidade], transports=['websocket'])
+            clientes.append(cliente)
+            recebidos.append(eventos_cliente)
+
+        latencias, falhas = [], []
+
+        def emitir(n):
+            inicio = time.perf_counter()
+            resposta = sessao.post(f'{urls[n % quantidade]}/gerar-senha',
+                                   json={'servico': 'Atendimento Geral', 'localizacao': f'Totem {n % 10}'})
+            latencias.append(time.perf_counter() - inicio)
+            if resposta.status_code != 201:
+                falhas.append((resposta.status_code, resposta.text[:200]))
+
+        inicio = time.perf_counter()
+        pool = Pool(args.concorrencia)
+        for n in range(args.senhas):
+            pool.spawn(emitir, n)
+        pool.join()
+        duracao = time.perf_counter() - inicio
+
+        esperados = args.senhas - len(falhas)
+        limite = time.monotonic() + args.espera
+        while time.monotonic() < limite and any(len(r) < esperados for r in recebidos):
+            time.sleep(0.1)
+
+        problemas = 0
+        for indice, eventos_cliente in enumerate(recebidos):
+            contagem = Counter(eventos_cliente)
+            epocas = {epoca for epoca, _ in contagem}
+            repetidos = sum(1 for vezes in contagem.values() if vezes > 1)
+            seqs = {seq for _, seq in contagem}
+            faltando = len(set(range(1, esperados + 1)) - seqs)
+            fora_de_ordem = sum(1 for a, b in zip(eventos_cliente, eventos_cliente[1:]) if b[1] < a[1])
+            if repetidos or faltando or len(epocas) > 1:
+                problemas += 1
+                print(f'  cliente {indice}: recebidos {len(eventos_cliente)} | repetidos {repetidos} | '
+                      f'faltando {faltando} | épocas {len(epocas)}')
+            elif indice == 0:
+                print(f'  cliente 0: {len(eventos_cliente)} eventos, {fora_de_ordem} fora de ordem')
+
+        print(f'Workers: {quantidade} | emissões: {args.senhas} em {duracao:.2f}s '
+              f'({args.senhas / duracao:.1f}/s) | falhas: {len(falhas)} | clientes com problemas: {problemas}')
+        print(f'  latência: {resumo_latencias(latencias)}')
+        for status, corpo in falhas[:5]:
+            print(f'  {status}: {corpo}')
+        return problemas == 0 and not falhas
+    finally:
+        # Os workers saem primeiro: com o gevent, o fechamento do WebSocket pelo
+        # cliente ficaria esperando a resposta do servidor indefinidamente
+        for processo in processos:
+            processo.terminate()
+        for processo in processos:
+            processo.wait()
+        for cliente in clientes:
+            cliente.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clientes', type=int, default=4)
+    parser.add_argument('--senhas', type=int, default=300)
+    parser.add_argument('--concorrencia', type=int, default=10)
+    parser.add_argument('--porta-base', type=int, default=5101)
+    parser.add_argument('--porta-broker', type=int, default=6391)
+    parser.add_argument('--espera', type=float, default=10.0, help='segundos aguardando eventos atrasados')
+    args = parser.parse_args()
+
+    ambiente = dict(os.environ,
+                    SOCKETIO_MESSAGE_QUEUE=f'local://127.0.0.1:{args.porta_broker}',
+                    FILA_MULTIPROCESSO='1',
+                    SOCKETIO_EVENTOS_LEGADOS='0')
+    broker = subprocess.Popen([sys.executable, 'broker_local.py', '--porta', str(args.porta_broker)],
+                              cwd=DIRETORIO_BACKEND, env=ambiente)
+    try:
+        time.sleep(1)
+        resultados = [rodada(args, quantidade, ambiente) for quantidade in args.workers]
+    finally:
+        broker.terminate()
+        broker.wait()
+    return 0 if all(resultados) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
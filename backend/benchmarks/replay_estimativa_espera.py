@@ -0,0 +1,188 @@
+# backend/benchmarks/replay_estimativa_espera.py
+"""Replay offline do estimador de espera: erro da previsão e custo de atualização.
+
+Reproduz em ordem cronológica as emissões, chamadas e fins de atendimento de um
+histórico de senhas ATENDIDA e, a cada emissão, compara a espera prevista pelo
+EstimadorEspera (com a profundidade da fila naquele instante) com a espera real
+(chamada - emissão). Para referência mostra também duas previsões ingênuas: a
+espera média do histórico e "senhas à frente x duração média / 1 guichê".
+
+O histórico vem da view senhas_relatorio do banco em DATABASE_URL (`--origem
+banco`) ou de um dia simulado, com chegadas variando ao longo do dia e tempos
+de atendimento log-normais (`--origem sintetico`, padrão).
+
+    python -m benchmarks.replay_estimativa_espera --horas 8 --guiches 3
+    DATABASE_URL=postgresql+psycopg2://... python -m benchmarks.replay_estimativa_espera --origem banco --desde 2024-05-01
+"""
+import argparse
+import heapq
+import math
+import random
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from benchmarks._comum import percentil
+
+Registro = namedtuple('Registro', 'id_senha id_servico is_prioritaria emissao chamada fim id_guiche')
+
+# Empates no mesmo instante: fim antes da chamada seguinte, emissão antes da chamada
+# (com a fila vazia a senha é chamada no instante em que sai do totem)
+_ORDEM_EVENTO = {'fim': 0, 'emissao': 1, 'chamada': 2}
+
+
+def historico_sintetico(args):
+    """Simula um dia: chegadas de Poisson com pico no meio do expediente,
+    `--guiches` guichês dedicados por serviço e fila prioritária."""
+    aleatorio = random.Random(args.semente)
+    inicio = datetime(2024, 5, 6, 8, 0)
+    duracao_dia = args.horas * 3600
+    # Log-normal com média `--atendimento-medio-s`
+    sigma = 0.6
+    mu = math.log(args.atendimento_medio_s) - sigma ** 2 / 2
+    registros, proximo_id = [], 1
+    for id_servico in range(1, args.servicos + 1):
+        # Taxa média que deixa os guichês com a ocupação pedida
+        taxa_media = args.ocupacao * args.guiches / args.atendimento_medio_s
+        # Pico no meio do dia com 1.5 x a taxa das pontas, mantendo a média em `taxa_media`
+        pico = taxa_media * 1.5 / (1 + 1 / math.pi)
+        chegadas, t = [], 0.0
+        while True:
+            # Afinamento (thinning) de um processo de Poisson com a taxa do pico
+            t += aleatorio.expovariate(pico)
+            if t >= duracao_dia:
+                break
+            taxa = pico * (1 + 0.5 * math.sin(math.pi * t / duracao_dia)) / 1.5
+            if aleatorio.random() < taxa / pico:
+                chegadas.append((t, aleatorio.random() < args.prioritarias))
+
+        livres = [(0.0, args.guiches * id_servico + g) for g in range(args.guiches)]
+        heapq.heapify(livres)
+        fila, indice = [], 0
+        while indice < len(chegadas) or fila:
+            livre_em, id_guiche = livres[0]
+            # Chegam à fila todas as senhas emitidas até o guichê ficar livre (ou a próxima, se vazia)
+            while indice < len(chegadas) and (chegadas[indice][0] <= livre_em or not fila):
+                emissao, prioritaria = chegadas[indice]
+                heapq.heappush(fila, (0 if prioritaria else 1, emissao, proximo_id))
+                proximo_id += 1
+                indice += 1
+            prioridade, emissao, id_senha = heapq.heappop(fila)
+            heapq.heappop(livres)
+            chamada = max(livre_em, emissao)
+            fim = chamada + aleatorio.lognormvariate(mu, sigma)
+            heapq.heappush(livres, (fim, id_guiche))
+            registros.append(Registro(id_senha, id_servico, prioridade == 0, inicio + timedelta(seconds=emissao),
+                                      inicio + timedelta(seconds=chamada), inicio + timedelta(seconds=fim), id_guiche))
+    return registros
+
+
+def historico_banco(args):
+    from benchmarks._comum import carregar_app
+    from sqlalchemy import text
+
+    modulo_app = carregar_app(recriar=False)
+    with modulo_app.app.app_context():
+        linhas = modulo_app.db.session.execute(text(
+            "SELECT id_senha, id_servico, is_prioritaria, data_hora_emissao, data_hora_chamada, "
+            "data_hora_fim_atendimento, id_guiche_atendimento FROM senhas_relatorio "
+            "WHERE status = 'ATENDIDA' AND data_hora_chamada IS NOT NULL AND data_hora_fim_atendimento IS NOT NULL "
+            "AND data_hora_emissao >= :desde ORDER BY data_hora_emissao"
+        ), {'desde': args.desde}).all()
+    return [Registro(*linha) for linha in linhas]
+
+
+def resumo_erros(erros_s):
+    absolutos = [abs(e) for e in erros_s]
+    return {
+        'mae_min': round(sum(absolutos) / len(absolutos) / 60, 2),
+        'p50_min': round(percentil(absolutos, 50) / 60, 2),
+        'p90_min': round(percentil(absolutos, 90) / 60, 2),
+        'vies_min': round(sum(erros_s) / len(erros_s) / 60, 2),
+        'ate_5min': f'{100 * sum(1 for a in absolutos if a <= 300) / len(absolutos):.0f}%',
+    }
+
+
+def replay(registros, estimador):
+    eventos = []
+    for r in registros:
+        eventos += [(r.emissao, 'emissao', r), (r.chamada, 'chamada', r), (r.fim, 'fim', r)]
+    eventos.sort(key=lambda e: (e[0], _ORDEM_EVENTO[e[1]]))
+
+    aguardando, prioritarias = {}, {}
+    previsoes, ingenua, reais = [], [], []
+    custo_atualizacao_ns, custo_estimativa_ns, atualizacoes = 0, 0, 0
+    duracoes = []
+    for momento, tipo, r in eventos:
+        if tipo == 'emissao':
+            a_frente = (prioritarias if r.is_prioritaria else aguardando).get(r.id_servico, 0)
+            inicio = time.perf_counter_ns()
+            previsoes.append(estimador.estimar(r.id_servico, a_frente, agora=momento))
+            custo_estimativa_ns += time.perf_counter_ns() - inicio
+            media = sum(duracoes[-200:]) / len(duracoes[-200:]) if duracoes else estimador.duracao_padrao_s
+            ingenua.append(a_frente * media)
+            reais.append((r.chamada - r.emissao).total_seconds())
+            aguardando[r.id_servico] = aguardando.get(r.id_servico, 0) + 1
+            if r.is_prioritaria:
+                prioritarias[r.id_servico] = prioritarias.get(r.id_servico, 0) + 1
+            continue
+        if tipo == 'chamada':
+            aguardando[r.id_servico] -= 1
+            if r.is_prioritaria:
+                prioritarias[r.id_servico] -= 1
+            inicio = time.perf_counter_ns()
+            estimador.registrar_chamada(r.id_senha, r.id_servico, r.id_guiche, r.chamada)
+        else:
+            duracoes.append((r.fim - r.chamada).total_seconds())
+            inicio = time.perf_counter_ns()
+            estimador.registrar_fim(r.id_senha, r.id_servico, r.id_guiche, r.chamada, r.fim)
+        custo_atualizacao_ns += time.perf_counter_ns() - inicio
+        atualizacoes += 1
+
+    espera_media = sum(reais) / len(reais)
+    return {
+        'estimador': resumo_erros([p - real for p, real in zip(previsoes, reais)]),
+        'fila x duração média': resumo_erros([p - real for p, real in zip(ingenua, reais)]),
+        'espera média': resumo_erros([espera_media - real for real in reais]),
+    }, custo_atualizacao_ns / max(atualizacoes, 1), custo_estimativa_ns / max(len(previsoes), 1), espera_media
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--origem', choices=('sintetico', 'banco'), default='sintetico')
+    parser.add_argument('--desde', type=datetime.fromisoformat, default=datetime(2000, 1, 1),
+                        help='com --origem banco: senhas emitidas a partir desta data')
+    parser.add_argument('--horas', type=float, default=8)
+    parser.add_argument('--servicos', type=int, default=2)
+    parser.add_argument('--guiches', type=int, default=3, help='guichês por serviço')
+    parser.add_argument('--ocupacao', type=float, default=0.75, help='ocupação média dos guichês')
+    parser.add_argument('--atendimento-medio-s', type=float, default=240)
+    parser.add_argument('--prioritarias', type=float, default=0.1, help='fração de senhas prioritárias')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--alfa', type=float, nargs='+', default=[0.05, 0.2, 0.5])
+    args = parser.parse_args()
+
+    from estimativa_espera import EstimadorEspera
+
+    registros = historico_sintetico(args) if args.origem == 'sintetico' else historico_banco(args)
+    if not registros:
+        print('Nenhuma senha atendida no histórico.')
+        return 1
+    print(f'Histórico: {len(registros)} senhas ({args.origem})')
+    print(f"{'previsão':>22} | {'alfa':>5} | {'MAE':>7} | {'p50':>7} | {'p90':>7} | {'viés':>7} | {'<=5min':>6}")
+    for indice, alfa in enumerate(args.alfa):
+        estimador = EstimadorEspera(alfa=alfa, duracao_padrao_s=args.atendimento_medio_s)
+        resultados, custo_atualizacao, custo_estimativa, espera_media = replay(registros, estimador)
+        for nome, erro in resultados.items():
+            if nome != 'estimador' and indice:
+                continue  # as referências não dependem de alfa
+            print(f"{nome:>22} | {alfa if nome == 'estimador' else '-':>5} | {erro['mae_min']:>7} | {erro['p50_min']:>7} | "
+                  f"{erro['p90_min']:>7} | {erro['vies_min']:>7} | {erro['ate_5min']:>6}")
+        print(f'{"":>22}   custo por evento: atualização {custo_atualizacao:.0f} ns, estimativa {custo_estimativa:.0f} ns')
+    print(f'Espera real média: {espera_media / 60:.1f} min (erros em minutos)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
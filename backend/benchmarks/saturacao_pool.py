@@ -0,0 +1,86 @@
+# backend/benchmarks/saturacao_pool.py
+"""Benchmark da saturação do pool de conexões sob concorrência de greenlets.
+
+Para cada nível de `--concorrencia`, solta N greenlets que pegam uma conexão do
+pool do app (com as opções de database.py) e a seguram `--duracao-ms` numa
+consulta lenta: pg_sleep no PostgreSQL; no SQLite, SELECT 1 seguido de
+gevent.sleep, que só simula a espera. Informa o tempo total contra o ideal
+(ceil(N / capacidade) x duração), a espera pelo checkout, quantos greenlets
+esgotaram o DB_POOL_TIMEOUT_S e o pico de conexões em uso.
+
+Com o driver cooperativo, até pool_size + max_overflow greenlets consultam ao
+mesmo tempo e o excedente espera em fila pelo checkout; no PostgreSQL com
+DB_DRIVER_GEVENT=false, cada pg_sleep trava o processo e as consultas se
+enfileiram uma a uma. Sai com código 1 se algum nível dentro da capacidade
+esgotou o timeout ou se sobrou conexão em uso no fim (vazamento).
+
+    DB_POOL_SIZE=5 DB_MAX_OVERFLOW=5 DB_POOL_TIMEOUT_S=1 python -m benchmarks.saturacao_pool --concorrencia 5 10 20 40
+"""
+import argparse
+import math
+import sys
+import time
+
+from benchmarks._comum import carregar_app, resumo_latencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concorrencia', type=int, nargs='+', default=[5, 10, 20, 40, 80])
+    parser.add_argument('--duracao-ms', type=int, default=200)
+    args = parser.parse_args()
+
+    modulo_app = carregar_app(recriar=False)
+    import gevent
+    from gevent.pool import Pool
+    from sqlalchemy import text
+    from sqlalchemy.exc import TimeoutError as TimeoutPool
+    from database import estado_pool
+
+    app, db = modulo_app.app, modulo_app.db
+    duracao = args.duracao_ms / 1000.0
+    falhou = False
+    with app.app_context():
+        engine = db.engine
+        postgres = engine.url.get_backend_name() == 'postgresql'
+        capacidade = app.config['DB_POOL_SIZE'] + app.config['DB_MAX_OVERFLOW']
+        print(f'Banco: {engine.url.get_backend_name()} | pool_size: {app.config["DB_POOL_SIZE"]} '
+              f'| max_overflow: {app.config["DB_MAX_OVERFLOW"]} | pool_timeout: {app.config["DB_POOL_TIMEOUT_S"]}s '
+              f'| consulta: {args.duracao_ms} ms | driver cooperativo: {app.config["DB_DRIVER_GEVENT"]}')
+        if not postgres:
+            print('SQLite: a consulta lenta é simulada com gevent.sleep; use o PostgreSQL para medir o driver.')
+
+        for concorrencia in args.concorrencia:
+            esperas, esgotados, pico = [], [], [0]
+
+            def consultar(_):
+                inicio = time.perf_counter()
+                try:
+                    with engine.connect() as conexao:
+                        esperas.append(time.perf_counter() - inicio)
+                        pico[0] = max(pico[0], estado_pool(engine).get('em_uso', 0))
+                        if postgres:
+                            conexao.execute(text('SELECT pg_sleep(:s)'), {'s': duracao})
+                        else:
+                            conexao.execute(text('SELECT 1'))
+                            gevent.sleep(duracao)
+                except TimeoutPool:
+                    esgotados.append(time.perf_counter() - inicio)
+
+            inicio = time.perf_counter()
+            Pool(concorrencia).map(consultar, range(concorrencia))
+            total = time.perf_counter() - inicio
+            ideal = math.ceil(concorrencia / capacidade) * duracao
+            print(f'\nConcorrência {concorrencia}: {total * 1000:.0f} ms (ideal {ideal * 1000:.0f} ms) '
+                  f'| pico em uso: {pico[0]}/{capacidade} | timeouts: {len(esgotados)}')
+            print(f'  Espera pelo checkout: {resumo_latencias(esperas)}')
+            if concorrencia <= capacidade and esgotados:
+                falhou = True
+
+        restantes = estado_pool(engine).get('em_uso', 0)
+        print(f'\nConexões em uso ao final: {restantes}')
+    return 1 if falhou or restantes else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
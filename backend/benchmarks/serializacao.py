@@ -0,0 +1,92 @@
+# backend/benchmarks/serializacao.py
+"""Micro-benchmark da serialização da fila: ORM + Senha.to_dict vs. SerializadorSenhas.
+
+Para cada tamanho de fila mede, numa sessão nova, quantas consultas SQL são
+executadas, o tempo total e o pico de memória alocada para montar a lista de
+dicionários enviada em /estado e nos eventos.
+
+    python -m benchmarks.serializacao --tamanhos 100 1000 10000
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from benchmarks._comum import carregar_app
+
+SERVICOS = ('Atendimento Geral', 'Prioritário', 'Cadastro', 'Documentos')
+
+
+def medir(db, engine, funcao):
+    from sqlalchemy import event
+
+    consultas = [0]
+
+    def contar(*_):
+        consultas[0] += 1
+
+    db.session.remove()
+    event.listen(engine, 'before_cursor_execute', contar)
+    tracemalloc.start()
+    try:
+        inicio = time.perf_counter()
+        resultado = funcao()
+        duracao = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        event.remove(engine, 'before_cursor_execute', contar)
+    return resultado, consultas[0], duracao, pico
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    modulo_app = carregar_app()
+    app, db, Senha, Servico = modulo_app.app, modulo_app.db, modulo_app.Senha, modulo_app.Servico
+    # Um serializador próprio, com o cache de nomes vazio a cada medição
+    from serializacao import SerializadorSenhas
+
+    print(f"{'fila':>7} | {'caminho':<14} | {'consultas':>9} | {'tempo (ms)':>10} | {'pico (KiB)':>10}")
+    with app.app_context():
+        servicos = [Servico(nome_servico=nome, prefixo_senha=nome[0]) for nome in SERVICOS]
+        db.session.add_all(servicos)
+        db.session.commit()
+        ids_servico = [s.id_servico for s in servicos]
+        engine = db.engine
+        criadas = 0
+        for tamanho in sorted(args.tamanhos):
+            inicio = datetime.utcnow()
+            db.session.add_all([
+                Senha(id_servico=ids_servico[n % len(ids_servico)], numero_sequencial=n, prefixo='X',
+                      senha_completa=f'X-{n}', is_prioritaria=(n % 10 == 0),
+                      data_hora_emissao=inicio + timedelta(microseconds=n), localizacao='Guichê 1')
+                for n in range(criadas + 1, tamanho + 1)
+            ])
+            db.session.commit()
+            criadas = tamanho
+
+            def via_orm():
+                senhas = Senha.query.filter_by(status='AGUARDANDO').order_by(Senha.data_hora_emissao).all()
+                return [s.to_dict() for s in senhas]
+
+            def via_serializador():
+                serializador = SerializadorSenhas(db, Senha, Servico)
+                return serializador.listar(Senha.status == 'AGUARDANDO', ordem=(Senha.data_hora_emissao,))
+
+            resultados = []
+            for nome, funcao in (('ORM + to_dict', via_orm), ('serializador', via_serializador)):
+                resultado, consultas, duracao, pico = medir(db, engine, funcao)
+                resultados.append(resultado)
+                print(f'{tamanho:>7} | {nome:<14} | {consultas:>9} | {duracao * 1000:>10.2f} | {pico / 1024:>10.0f}')
+            if resultados[0] != resultados[1]:
+                print('ERRO: os dois caminhos produziram JSON diferente')
+                return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+# backend/broker_local.py
+"""Broker pub/sub mínimo para rodar vários workers Socket.IO sem Redis.
+
+Serve para desenvolvimento e para o harness de benchmarks/multiprocesso.py:
+cada worker publica as emissões no broker, que as repassa a todos os workers
+(inclusive ao que publicou), e cada um entrega aos seus próprios clientes. Em
+produção use SOCKETIO_MESSAGE_QUEUE=redis://...
+
+    python broker_local.py --porta 6390
+    SOCKETIO_MESSAGE_QUEUE=local://127.0.0.1:6390 python app.py
+"""
+import argparse
+import json
+import logging
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+import socketio
+
+PORTA_PADRAO = 6390
+
+logger = logging.getLogger('broker_local')
+
+
+class GerenciadorBrokerLocal(socketio.PubSubManager):
+    """Client manager do python-socketio que usa o broker local como fila de mensagens.
+
+    As mensagens trafegam como JSON, uma por linha: publicadores abrem uma
+    conexão 'PUB' e o listener de cada worker mantém uma conexão 'SUB'.
+    """
+    name = 'broker-local'
+
+    def __init__(self, url='local://127.0.0.1:6390', channel='flask-socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        destino = urlparse(url)
+        self.endereco = (destino.hostname or '127.0.0.1', destino.port or PORTA_PADRAO)
+        self._conexao_pub = None
+        self._lock_pub = threading.Lock()
+
+    def _conectar(self, papel):
+        conexao = socket.create_connection(self.endereco)
+        conexao.sendall(papel + b'\n')
+        return conexao
+
+    def _publish(self, data):
+        linha = (json.dumps({'canal': self.channel, 'dados': data}) + '\n').encode('utf-8')
+        with self._lock_pub:
+            for _ in range(2):
+                try:
+                    if self._conexao_pub is None:
+                        self._conexao_pub = self._conectar(b'PUB')
+                    self._conexao_pub.sendall(linha)
+                    return
+                except OSError:
+                    self._conexao_pub = None
+        logger.error('Não foi possível publicar no broker local %s:%s', *self.endereco)
+
+    def _listen(self):
+        while True:
+            try:
+                conexao = self._conectar(b'SUB')
+                for linha in conexao.makefile('rb'):
+                    mensagem = json.loads(linha)
+                    if mensagem.get('canal') == self.channel:
+                        yield mensagem['dados']
+            except OSError:
+                logger.error('Conexão com o broker local perdida, tentando novamente...')
+            time.sleep(1)
+
+
+def servir(host='127.0.0.1', porta=PORTA_PADRAO):
+    from gevent import monkey
+    monkey.patch_all()
+    from gevent.queue import Queue
+    from gevent.server import StreamServer
+    import gevent
+
+    assinantes = set()
+
+    def escritor(conexao, fila):
+        # Um escritor por assinante, para que linhas de publicadores diferentes não se misturem
+        try:
+            for linha in fila:
+                conexao.sendall(linha)
+        except OSError:
+            pass
+
+    def atender(conexao, _endereco):
+        arquivo = conexao.makefile('rb')
+        papel = arquivo.readline().strip()
+        if papel == b'SUB':
+            fila = Queue()
+            assinantes.add(fila)
+            tarefa = gevent.spawn(escritor, conexao, fila)
+            try:
+                arquivo.read()  # bloqueia até o worker desconectar
+            finally:
+                assinantes.discard(fila)
+                fila.put(StopIteration)
+                tarefa.kill()
+        elif papel == b'PUB':
+            for linha in arquivo:
+                for fila in list(assinantes):
+                    fila.put(linha)
+
+    logger.info('Broker local ouvindo em %s:%s', host, porta)
+    StreamServer((host, porta), atender).serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Broker pub/sub local para o Socket.IO')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s [%(name)s] %(message)s')
+    servir(args.host, args.porta)
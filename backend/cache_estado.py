@@ -0,0 +1,56 @@
+# backend/cache_estado.py
+import gzip
+import threading
+from collections import OrderedDict
+
+
+class CacheEstado:
+    """Snapshot de /estado já serializado, válido enquanto a versão da fila não muda.
+
+    A versão é a tupla (`seq` do publicador de eventos, janela de tempo): o seq é
+    incrementado por toda rota que altera a fila e a janela renova as estimativas
+    de espera, que mudam com o relógio mesmo sem eventos. Cada variação da rota
+    (ex.: ?guiche=2) tem sua entrada, até `max_entradas`: acima disso a variação
+    usada há mais tempo é descartada (os parâmetros vêm do cliente). O corpo
+    comprimido com gzip é gerado uma única vez por versão, na primeira vez que
+    algum cliente aceitar gzip.
+    """
+
+    def __init__(self, tamanho_minimo_gzip=1024, max_entradas=64):
+        self.tamanho_minimo_gzip = tamanho_minimo_gzip
+        self.max_entradas = max(1, max_entradas)
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # chave -> {'versao', 'etag', 'corpo', 'corpo_gzip'}, da menos à mais usada
+
+    @staticmethod
+    def etag(epoca, versao, chave):
+        # Sem aspas: o Werkzeug cuida delas em set_etag / if_none_match.contains
+        return f'estado-{epoca}-{".".join(map(str, versao))}-{chave if chave is not None else "todos"}'
+
+    def obter(self, chave, versao):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None or entrada['versao'] != versao:
+                return None
+            self._entradas.move_to_end(chave)
+        return entrada
+
+    def guardar(self, chave, versao, etag, corpo):
+        entrada = {'versao': versao, 'etag': etag, 'corpo': corpo, 'corpo_gzip': None}
+        with self._lock:
+            atual = self._entradas.get(chave)
+            # Nunca substitui um snapshot mais novo montado por outra requisição
+            if atual is None or atual['versao'] <= versao:
+                self._entradas[chave] = entrada
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+        return entrada
+
+    def corpo_gzip(self, entrada):
+        """Corpo comprimido, ou None quando é pequeno demais para valer a pena."""
+        if len(entrada['corpo']) < self.tamanho_minimo_gzip:
+            return None
+        if entrada['corpo_gzip'] is None:
+            entrada['corpo_gzip'] = gzip.compress(entrada['corpo'], compresslevel=6)
+        return entrada['corpo_gzip']
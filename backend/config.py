@@ -11,7 +11,54 @@ class Config:
         f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_DATABASE')}"
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False # Desativa o rastreamento de modificações do SQLAlchemy (melhora performance)
+    # Pool de conexões por processo: com o gevent, cada greenlet numa consulta segura uma conexão;
+    # além de pool_size + max_overflow, o checkout espera até DB_POOL_TIMEOUT_S e falha
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT_S = int(os.getenv('DB_POOL_TIMEOUT_S', 10))  # segundos inteiros (o SQLAlchemy converte para int)
+    DB_POOL_RECYCLE_S = int(os.getenv('DB_POOL_RECYCLE_S', 1800))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'sim')
+    # Limites do PostgreSQL por conexão (0 = sem limite). Para o recalcular-estatisticas
+    # sobre todo o histórico, rode com DB_STATEMENT_TIMEOUT_MS=0
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 15000))
+    DB_IDLE_TRANSACAO_TIMEOUT_MS = int(os.getenv('DB_IDLE_TRANSACAO_TIMEOUT_MS', 60000))
+    # psycopg2 cooperativo com o gevent (callback de espera, como o psycogreen)
+    DB_DRIVER_GEVENT = os.getenv('DB_DRIVER_GEVENT', 'true').lower() in ('1', 'true', 'sim')
     # Configurações para Flask-SocketIO
-    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE', None) # Pode ser usado para escalar o SocketIO com Redis
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE', None) # Pode ser usado para escalar o SocketIO com Redis (ou local:// com o broker_local.py)
+    # Mais de um worker/instância: versão da fila no banco e sincronização da fila em memória entre workers
+    FILA_MULTIPROCESSO = os.getenv('FILA_MULTIPROCESSO', 'true' if SOCKETIO_MESSAGE_QUEUE else 'false').lower() in ('1', 'true', 'sim')
+    # Mantém os eventos antigos ('fila_atualizada' com a fila inteira e 'senha_chamada') junto com os eventos
+    # incrementais, para clientes que ainda não usam 'fila_eventos'. Desligado: cada janela reenviaria a fila inteira
+    SOCKETIO_EVENTOS_LEGADOS = os.getenv('SOCKETIO_EVENTOS_LEGADOS', 'false').lower() in ('1', 'true', 'sim')
+    # Janela em que as mudanças da fila são juntadas numa única emissão (0 = emite dentro da requisição)
+    SOCKETIO_JANELA_MS = int(os.getenv('SOCKETIO_JANELA_MS', 150))
+    # Numeração das senhas: reinício diário (A-001 a cada dia) e quantos números cada processo reserva por vez
+    SENHA_RESET_DIARIO = os.getenv('SENHA_RESET_DIARIO', 'false').lower() in ('1', 'true', 'sim')
+    SENHA_TAMANHO_BLOCO = int(os.getenv('SENHA_TAMANHO_BLOCO', 1))
+    # Máximo de senhas por chamada em /gerar-senhas (emissão em lote)
+    SENHA_LOTE_MAXIMO = int(os.getenv('SENHA_LOTE_MAXIMO', 500))
+    # Arquivamento das senhas encerradas em senhas_historico (intervalo 0 desliga o agendamento)
+    ARQUIVAMENTO_INTERVALO_S = int(os.getenv('ARQUIVAMENTO_INTERVALO_S', 300))
+    ARQUIVAMENTO_LOTE = int(os.getenv('ARQUIVAMENTO_LOTE', 1000))
+    ARQUIVAMENTO_IDADE_HORAS = float(os.getenv('ARQUIVAMENTO_IDADE_HORAS', 24))
+    # Intervalo de gravação das estatísticas pré-agregadas (0 = grava dentro da requisição)
+    ESTATISTICAS_INTERVALO_S = int(os.getenv('ESTATISTICAS_INTERVALO_S', 10))
+    # Estimativa de espera: peso do atendimento mais recente na média móvel, duração suposta
+    # antes do primeiro atendimento do serviço e por quanto tempo um guichê sem chamar continua ativo
+    ESPERA_EWMA_ALFA = float(os.getenv('ESPERA_EWMA_ALFA', 0.2))
+    ESPERA_DURACAO_PADRAO_S = float(os.getenv('ESPERA_DURACAO_PADRAO_S', 300))
+    ESPERA_JANELA_GUICHE_MIN = float(os.getenv('ESPERA_JANELA_GUICHE_MIN', 30))
+    # As estimativas também mudam com o relógio: o snapshot de /estado (e o ETag) vale por esta janela
+    ESPERA_VALIDADE_S = int(os.getenv('ESPERA_VALIDADE_S', 60))
+    # Variações de /estado (?guiche= / ?servico=) mantidas em cache; as menos usadas saem primeiro
+    ESTADO_CACHE_MAX_ENTRADAS = int(os.getenv('ESTADO_CACHE_MAX_ENTRADAS', 64))
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    # Instrumentação em GET /metrics e log das requisições mais lentas que o limite (0 = não registra)
+    METRICAS_HABILITADAS = os.getenv('METRICAS_HABILITADAS', 'true').lower() in ('1', 'true', 'sim')
+    METRICAS_REQUISICAO_LENTA_MS = int(os.getenv('METRICAS_REQUISICAO_LENTA_MS', 0))
+    METRICAS_SQL_NO_LOG = int(os.getenv('METRICAS_SQL_NO_LOG', 5))
+    # Mede o tamanho do payload em uma a cada N emissões de cada evento Socket.IO
+    METRICAS_AMOSTRA_BYTES = int(os.getenv('METRICAS_AMOSTRA_BYTES', 20))
     CORS_HEADERS = 'Content-Type' # Cabeçalhos CORS permitidos
     PORT = os.getenv('PORT', 5000)
\ No newline at end of file
@@ -1,7 +1,87 @@
 # backend/database.py
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
 
-db = SQLAlchemy() # Inicializa o SQLAlchemy sem passar o app Flask aqui
+# Instância única usada pelos modelos (pacote models) e pelo app; ligada ao app em iniciar_banco.
+# expire_on_commit=False: os objetos continuam legíveis depois do commit sem um
+# SELECT de recarga (cada requisição usa uma sessão nova de qualquer forma).
+db = SQLAlchemy(session_options={'expire_on_commit': False})
 
-# Nota: A conexão real será testada quando tentarmos interagir com os modelos
-# ou quando o Flask-Migrate for executado.
+
+def opcoes_engine(config, uri):
+    """Opções do create_engine (SQLALCHEMY_ENGINE_OPTIONS) a partir das chaves DB_* da configuração."""
+    url = make_url(uri)
+    opcoes = {
+        # Descarta conexões derrubadas pelo servidor (reinício, proxy, idle) antes de usá-las
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'pool_recycle': config['DB_POOL_RECYCLE_S'],
+    }
+    # O SQLite em memória usa um pool de conexão única, que não aceita dimensionamento
+    if url.get_backend_name() != 'sqlite' or url.database not in (None, '', ':memory:'):
+        opcoes.update(
+            pool_size=config['DB_POOL_SIZE'],
+            max_overflow=config['DB_MAX_OVERFLOW'],
+            pool_timeout=config['DB_POOL_TIMEOUT_S'],
+        )
+    if url.get_backend_name() == 'postgresql':
+        # Limites aplicados pelo próprio servidor a cada conexão do pool (0 = sem limite)
+        parametros = [f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}",
+                      f"-c idle_in_transaction_session_timeout={config['DB_IDLE_TRANSACAO_TIMEOUT_MS']}"]
+        opcoes['connect_args'] = {'options': ' '.join(parametros)}
+    return opcoes
+
+
+def preparar_driver_gevent():
+    """Faz o psycopg2 ceder o loop do gevent enquanto espera o banco.
+
+    O psycopg2 fala com o servidor pela libpq, em C: o monkey patch não alcança
+    esse socket e cada consulta travaria o processo inteiro. Com o callback de
+    espera (o mesmo do psycogreen), a libpq trabalha em modo assíncrono e o
+    greenlet dorme em wait_read/wait_write. Devolve False sem psycopg2.
+    """
+    try:
+        import psycopg2
+        from psycopg2 import extensions
+    except ImportError:
+        return False
+    from gevent.socket import wait_read, wait_write
+
+    def aguardar(conexao, timeout=None):
+        while True:
+            estado = conexao.poll()
+            if estado == extensions.POLL_OK:
+                return
+            if estado == extensions.POLL_READ:
+                wait_read(conexao.fileno(), timeout=timeout)
+            elif estado == extensions.POLL_WRITE:
+                wait_write(conexao.fileno(), timeout=timeout)
+            else:
+                raise psycopg2.OperationalError(f'Resultado inesperado do poll: {estado!r}')
+
+    extensions.set_wait_callback(aguardar)
+    return True
+
+
+def iniciar_banco(app):
+    """Liga `db` ao app com as opções de pool e o driver compatível com o gevent."""
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS',
+                          opcoes_engine(app.config, app.config['SQLALCHEMY_DATABASE_URI']))
+    if app.config['DB_DRIVER_GEVENT']:
+        from gevent import monkey
+        if monkey.is_module_patched('socket'):
+            preparar_driver_gevent()
+    db.init_app(app)
+
+
+def estado_pool(engine):
+    """Conexões do pool por estado (vazio para pools que não são QueuePool)."""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {}
+    return {
+        'em_uso': pool.checkedout(),
+        'livres': pool.checkedin(),
+        'overflow': max(pool.overflow(), 0),
+        'tamanho': pool.size(),
+    }
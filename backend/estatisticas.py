@@ -0,0 +1,278 @@
+# backend/estatisticas.py
+import logging
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, bindparam, text
+
+logger = logging.getLogger(__name__)
+
+# Tamanho dos baldes de agregação
+GRANULARIDADES = {'5min': timedelta(minutes=5), 'dia': timedelta(days=1)}
+# 'geral' (id 0) soma tudo; as demais usam o id do serviço, do guichê ou do atendente
+DIMENSOES = ('geral', 'servico', 'guiche', 'atendente')
+METRICAS = ('espera', 'atendimento')
+# Limite superior (em segundos) de cada faixa do histograma; a última faixa é aberta.
+# As faixas curtas do início evitam percentis de 15 s para esperas de 0 s (o percentil
+# é interpolado dentro da faixa). Mudou a lista? Rode o recalcular-estatisticas, porque
+# as faixas gravadas são índices desta tupla
+FAIXAS_S = (1, 5, 10, 20, 30, 60, 120, 180, 300, 450, 600, 900, 1200, 1800, 2700, 3600, 5400, 7200)
+
+_CONTADORES = ('emitidas', 'chamadas', 'atendidas', 'soma_espera_s', 'soma_atendimento_s')
+
+_SOMAR_BALDE = text(
+    "INSERT INTO estatisticas_atendimento (granularidade, inicio, dimensao, id_dimensao, "
+    "emitidas, chamadas, atendidas, soma_espera_s, soma_atendimento_s) "
+    "VALUES (:granularidade, :inicio, :dimensao, :id_dimensao, "
+    ":emitidas, :chamadas, :atendidas, :soma_espera_s, :soma_atendimento_s) "
+    "ON CONFLICT (granularidade, inicio, dimensao, id_dimensao) DO UPDATE SET "
+    + ', '.join(f'{c} = estatisticas_atendimento.{c} + excluded.{c}' for c in _CONTADORES)
+).bindparams(bindparam('inicio', type_=DateTime))
+
+_SOMAR_FAIXA = text(
+    "INSERT INTO estatisticas_faixas (granularidade, inicio, dimensao, id_dimensao, metrica, faixa, quantidade) "
+    "VALUES (:granularidade, :inicio, :dimensao, :id_dimensao, :metrica, :faixa, :quantidade) "
+    "ON CONFLICT (granularidade, inicio, dimensao, id_dimensao, metrica, faixa) "
+    "DO UPDATE SET quantidade = estatisticas_faixas.quantidade + excluded.quantidade"
+).bindparams(bindparam('inicio', type_=DateTime))
+
+
+def _datas(consulta, *nomes):
+    # Datas sempre passam pelo tipo DateTime, para o SQLite comparar textos no mesmo formato
+    return consulta.bindparams(*(bindparam(nome, type_=DateTime) for nome in nomes))
+
+
+def inicio_balde(momento, granularidade):
+    if granularidade == 'dia':
+        return momento.replace(hour=0, minute=0, second=0, microsecond=0)
+    return momento.replace(minute=momento.minute - momento.minute % 5, second=0, microsecond=0)
+
+
+def percentil(contagens, p):
+    """Percentil aproximado (interpolado dentro da faixa) de um histograma em FAIXAS_S."""
+    total = sum(contagens)
+    if not total:
+        return None
+    alvo = p / 100.0 * total
+    acumulado = 0
+    for indice, quantidade in enumerate(contagens):
+        if quantidade and acumulado + quantidade >= alvo:
+            inferior = FAIXAS_S[indice - 1] if indice else 0
+            if indice >= len(FAIXAS_S):
+                return float(inferior)
+            return round(inferior + (FAIXAS_S[indice] - inferior) * (alvo - acumulado) / quantidade, 1)
+        acumulado += quantidade
+    return float(FAIXAS_S[-1])
+
+
+class RollupEstatisticas:
+    """Estatísticas de espera e atendimento pré-agregadas em baldes de 5 minutos e de um dia.
+
+    As rotas registram cada emissão, chamada e fim de atendimento; os incrementos
+    se acumulam em memória e são gravados em lote (INSERT ... ON CONFLICT DO
+    UPDATE somando), a cada `descarregar`. Somas são comutativas, então vários
+    workers gravam nos mesmos baldes sem coordenação. A espera conta no balde do
+    momento da chamada e o atendimento no do fim; uma senha reencaminhada tem a
+    chamada contada de novo quando for chamada outra vez.
+
+    A API de estatísticas lê só estas tabelas, nunca `senhas`.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        self._baldes = {}  # (granularidade, inicio, dimensao, id) -> [contadores]
+        self._faixas = {}  # (granularidade, inicio, dimensao, id, metrica, faixa) -> quantidade
+        self._limites = None  # no recálculo: granularidade -> início do primeiro balde ignorado
+
+    # ------------------------------------------------------------
+    # Registro
+    # ------------------------------------------------------------
+    def _somar(self, momento, dimensoes, indice, metrica=None, segundos=None):
+        faixa = bisect_left(FAIXAS_S, segundos) if metrica else None
+        with self._lock:
+            for granularidade in GRANULARIDADES:
+                inicio = inicio_balde(momento, granularidade)
+                if self._limites is not None and inicio >= self._limites[granularidade]:
+                    continue
+                for dimensao, id_dimensao in dimensoes:
+                    chave = (granularidade, inicio, dimensao, id_dimensao)
+                    contadores = self._baldes.setdefault(chave, [0, 0, 0, 0.0, 0.0])
+                    contadores[indice] += 1
+                    if metrica:
+                        contadores[indice + 2] += segundos
+                        chave_faixa = chave + (metrica, faixa)
+                        self._faixas[chave_faixa] = self._faixas.get(chave_faixa, 0) + 1
+
+    @staticmethod
+    def _dimensoes(id_servico, id_guiche=None, id_atendente=None):
+        dimensoes = [('geral', 0), ('servico', id_servico)]
+        if id_guiche is not None:
+            dimensoes.append(('guiche', id_guiche))
+        if id_atendente is not None:
+            dimensoes.append(('atendente', id_atendente))
+        return dimensoes
+
+    def registrar_emissao(self, id_servico, emissao):
+        self._somar(emissao, self._dimensoes(id_servico), 0)
+
+    def registrar_chamada(self, id_servico, id_guiche, id_atendente, emissao, chamada):
+        espera = max(0.0, (chamada - emissao).total_seconds())
+        self._somar(chamada, self._dimensoes(id_servico, id_guiche, id_atendente), 1, metrica='espera', segundos=espera)
+
+    def registrar_fim(self, id_servico, id_guiche, id_atendente, chamada, fim):
+        if chamada is None:
+            return
+        duracao = max(0.0, (fim - chamada).total_seconds())
+        self._somar(fim, self._dimensoes(id_servico, id_guiche, id_atendente), 2, metrica='atendimento', segundos=duracao)
+
+    def registrar_senha(self, senha, desde=None):
+        """Registra todos os eventos já ocorridos de uma senha (usado no recálculo)."""
+        if desde is None or senha.data_hora_emissao >= desde:
+            self.registrar_emissao(senha.id_servico, senha.data_hora_emissao)
+        chamada, fim = senha.data_hora_chamada, senha.data_hora_fim_atendimento
+        if chamada is not None and (desde is None or chamada >= desde):
+            self.registrar_chamada(senha.id_servico, senha.id_guiche_atendimento, senha.id_atendente,
+                                   senha.data_hora_emissao, chamada)
+        if fim is not None and (desde is None or fim >= desde):
+            self.registrar_fim(senha.id_servico, senha.id_guiche_atendimento, senha.id_atendente, chamada, fim)
+
+    # ------------------------------------------------------------
+    # Gravação
+    # ------------------------------------------------------------
+    def descarregar(self):
+        """Grava os incrementos acumulados numa única transação."""
+        with self._lock:
+            baldes, faixas = self._baldes, self._faixas
+            self._baldes, self._faixas = {}, {}
+        if not baldes:
+            return 0
+        try:
+            with self.db.engine.begin() as conexao:
+                conexao.execute(_SOMAR_BALDE, [
+                    dict(zip(('granularidade', 'inicio', 'dimensao', 'id_dimensao') + _CONTADORES, chave + tuple(valores)))
+                    for chave, valores in sorted(baldes.items())
+                ])
+                if faixas:
+                    conexao.execute(_SOMAR_FAIXA, [
+                        dict(zip(('granularidade', 'inicio', 'dimensao', 'id_dimensao', 'metrica', 'faixa', 'quantidade'),
+                                 chave + (quantidade,)))
+                        for chave, quantidade in sorted(faixas.items())
+                    ])
+        except Exception:
+            # Devolve os incrementos para a próxima tentativa
+            with self._lock:
+                for chave, valores in baldes.items():
+                    atuais = self._baldes.setdefault(chave, [0, 0, 0, 0.0, 0.0])
+                    for indice, valor in enumerate(valores):
+                        atuais[indice] += valor
+                for chave, quantidade in faixas.items():
+                    self._faixas[chave] = self._faixas.get(chave, 0) + quantidade
+            raise
+        return len(baldes)
+
+    def executar_periodicamente(self, intervalo, contexto):
+        """Laço do greenlet que grava os incrementos a cada `intervalo` segundos."""
+        while True:
+            time.sleep(intervalo)
+            try:
+                with contexto():
+                    self.descarregar()
+            except Exception:
+                logger.exception('Erro ao gravar as estatísticas')
+
+    def recalcular(self, desde, lote=50000, margem=timedelta(hours=1)):
+        """Reconstrói os baldes a partir de `desde` (alinhado ao início do dia) lendo
+        as senhas vivas e as arquivadas. Devolve quantas senhas foram lidas.
+
+        Os workers continuam somando seus incrementos enquanto o recálculo roda, e o
+        que ainda está na memória deles seria contado duas vezes; por isso só são
+        refeitos os baldes fechados há mais de `margem` (bem mais que o intervalo de
+        gravação). Os baldes mais recentes ficam como estão.
+        """
+        desde = inicio_balde(desde, 'dia')
+        corte = datetime.utcnow() - margem
+        limites = {granularidade: inicio_balde(corte, granularidade) for granularidade in GRANULARIDADES}
+        self.descarregar()
+        with self.db.engine.begin() as conexao:
+            for tabela in ('estatisticas_atendimento', 'estatisticas_faixas'):
+                for granularidade, limite in limites.items():
+                    conexao.execute(_datas(text(
+                        f"DELETE FROM {tabela} WHERE granularidade = :granularidade AND inicio >= :desde AND inicio < :limite"
+                    ), 'desde', 'limite'), {'granularidade': granularidade, 'desde': desde, 'limite': limite})
+        # Acumulador separado: os incrementos ao vivo deste processo não se misturam ao recálculo
+        recalculo = RollupEstatisticas(self.db)
+        recalculo._limites = limites
+        lidas = 0
+        with self.db.engine.connect() as conexao:
+            consulta = text(
+                "SELECT id_servico, id_guiche_atendimento, id_atendente, data_hora_emissao, "
+                "data_hora_chamada, data_hora_fim_atendimento FROM senhas_relatorio "
+                "WHERE data_hora_emissao >= :desde OR data_hora_chamada >= :desde OR data_hora_fim_atendimento >= :desde"
+            ).columns(data_hora_emissao=DateTime, data_hora_chamada=DateTime, data_hora_fim_atendimento=DateTime)
+            resultado = conexao.execution_options(stream_results=True, yield_per=lote).execute(
+                _datas(consulta, 'desde'), {'desde': desde})
+            for senha in resultado:
+                recalculo.registrar_senha(senha, desde)
+                lidas += 1
+                if lidas % lote == 0:
+                    recalculo.descarregar()
+        recalculo.descarregar()
+        return lidas
+
+    # ------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------
+    def consultar(self, granularidade, dimensao, de, ate, id_dimensao=None, agregar=False):
+        """Baldes de [de, ate) com contagens, médias e percentis.
+
+        Com `agregar`, soma os baldes do período num único resultado por id da dimensão.
+        """
+        filtros = "granularidade = :granularidade AND dimensao = :dimensao AND inicio >= :de AND inicio < :ate"
+        parametros = {'granularidade': granularidade, 'dimensao': dimensao, 'de': de, 'ate': ate}
+        if id_dimensao is not None:
+            filtros += " AND id_dimensao = :id_dimensao"
+            parametros['id_dimensao'] = id_dimensao
+        with self.db.engine.connect() as conexao:
+            baldes = conexao.execute(_datas(text(
+                f"SELECT inicio, id_dimensao, {', '.join(_CONTADORES)} FROM estatisticas_atendimento "
+                f"WHERE {filtros} ORDER BY inicio, id_dimensao"
+            ).columns(inicio=DateTime), 'de', 'ate'), parametros).all()
+            faixas = conexao.execute(_datas(text(
+                f"SELECT inicio, id_dimensao, metrica, faixa, quantidade FROM estatisticas_faixas WHERE {filtros}"
+            ).columns(inicio=DateTime), 'de', 'ate'), parametros).all()
+
+        resultados = {}
+        for inicio, id_atual, *contadores in baldes:
+            chave = id_atual if agregar else (inicio, id_atual)
+            resultado = resultados.setdefault(chave, {
+                'inicio': None if agregar else inicio.isoformat(),
+                'id': id_atual,
+                **{c: 0 for c in _CONTADORES},
+                'faixas': {m: [0] * (len(FAIXAS_S) + 1) for m in METRICAS},
+            })
+            for nome, valor in zip(_CONTADORES, contadores):
+                resultado[nome] += valor
+        for inicio, id_atual, metrica, faixa, quantidade in faixas:
+            resultado = resultados.get(id_atual if agregar else (inicio, id_atual))
+            if resultado is not None:
+                resultado['faixas'][metrica][faixa] += quantidade
+
+        saida = []
+        for resultado in resultados.values():
+            faixas_resultado = resultado.pop('faixas')
+            soma_espera, soma_atendimento = resultado.pop('soma_espera_s'), resultado.pop('soma_atendimento_s')
+            resultado['espera'] = self._resumo(soma_espera, resultado['chamadas'], faixas_resultado['espera'])
+            resultado['atendimento'] = self._resumo(soma_atendimento, resultado['atendidas'], faixas_resultado['atendimento'])
+            saida.append(resultado)
+        return saida
+
+    @staticmethod
+    def _resumo(soma, quantidade, contagens):
+        return {
+            'media_s': round(soma / quantidade, 1) if quantidade else None,
+            'p50_s': percentil(contagens, 50),
+            'p95_s': percentil(contagens, 95),
+        }
@@ -0,0 +1,114 @@
+# backend/estimativa_espera.py
+import math
+import threading
+from datetime import datetime, timedelta
+
+
+class EstimadorEspera:
+    """Estimativa on-line do tempo de espera de uma senha nova, por serviço.
+
+    Mantém, a cada chamada e fim de atendimento, só estatísticas de fluxo (O(1)
+    por evento, nada é relido de `senhas`):
+
+    - a duração média do atendimento de cada serviço, por média móvel
+      exponencial (`alfa` é o peso do atendimento mais recente);
+    - os guichês ativos em cada serviço (chamaram ou finalizaram uma senha dele
+      nos últimos `janela_guiche`) e quais deles estão ocupados agora.
+
+    Com c guichês ativos, o ocupados e n senhas à frente, a senha nova espera
+    uma vaga se n + o >= c: cerca de (n + o - c + 1) atendimentos divididos
+    entre os c guichês. A profundidade da fila vem da fila em memória.
+    """
+
+    def __init__(self, alfa=0.2, duracao_padrao_s=300.0, janela_guiche=timedelta(minutes=30)):
+        self.alfa = alfa
+        self.duracao_padrao_s = duracao_padrao_s
+        self.janela_guiche = janela_guiche
+        self._lock = threading.Lock()
+        self._duracoes = {}  # id_servico -> [duração média (s), amostras]
+        self._guiches_servico = {}  # id_servico -> {id_guiche: último evento}
+        self._guiches = {}  # id_guiche -> [id_senha em atendimento ou None, última senha finalizada]
+
+    # ------------------------------------------------------------
+    # Eventos
+    # ------------------------------------------------------------
+    def registrar_chamada(self, id_senha, id_servico, id_guiche, chamada):
+        if id_guiche is None or chamada is None:
+            return
+        with self._lock:
+            self._guiches_servico.setdefault(id_servico, {})[id_guiche] = chamada
+            self._guiches.setdefault(id_guiche, [None, None])[0] = id_senha
+
+    def registrar_fim(self, id_senha, id_servico, id_guiche, chamada, fim):
+        if id_guiche is None or chamada is None or fim is None:
+            return
+        with self._lock:
+            guiche = self._guiches.setdefault(id_guiche, [None, None])
+            if guiche[1] == id_senha:
+                return  # o mesmo fim lido de novo na sincronização entre workers
+            guiche[1] = id_senha
+            if guiche[0] == id_senha:
+                guiche[0] = None
+            self._guiches_servico.setdefault(id_servico, {})[id_guiche] = fim
+            duracao = max((fim - chamada).total_seconds(), 0.0)
+            atual = self._duracoes.get(id_servico)
+            if atual is None:
+                self._duracoes[id_servico] = [duracao, 1]
+            else:
+                atual[0] += self.alfa * (duracao - atual[0])
+                atual[1] += 1
+
+    def liberar_guiche(self, id_guiche):
+        """O guichê ficou livre sem concluir o atendimento (senha reencaminhada)."""
+        with self._lock:
+            if id_guiche in self._guiches:
+                self._guiches[id_guiche][0] = None
+
+    def registrar_senha(self, senha):
+        """Aplica o estado atual de uma senha (instância ou linha com as colunas de
+        data, guichê e status), como na carga inicial e na sincronização entre workers."""
+        if senha.status == 'CHAMANDO':
+            self.registrar_chamada(senha.id_senha, senha.id_servico, senha.id_guiche_atendimento, senha.data_hora_chamada)
+        elif senha.status == 'ATENDIDA':
+            self.registrar_fim(senha.id_senha, senha.id_servico, senha.id_guiche_atendimento,
+                               senha.data_hora_chamada, senha.data_hora_fim_atendimento)
+
+    # ------------------------------------------------------------
+    # Estimativa
+    # ------------------------------------------------------------
+    def _guiches_ativos(self, id_servico, agora):
+        # Percorre só os guichês do serviço (poucos) e esquece os inativos
+        guiches = self._guiches_servico.get(id_servico, {})
+        limite = agora - self.janela_guiche
+        for id_guiche in [g for g, ultimo in guiches.items() if ultimo < limite]:
+            del guiches[id_guiche]
+        ocupados = sum(1 for id_guiche in guiches if self._guiches.get(id_guiche, [None])[0] is not None)
+        return len(guiches), ocupados
+
+    def estimar(self, id_servico, a_frente, agora=None):
+        """Espera estimada, em segundos, de uma senha com `a_frente` senhas antes dela."""
+        agora = agora or datetime.utcnow()
+        with self._lock:
+            ativos, ocupados = self._guiches_ativos(id_servico, agora)
+            duracao = self._duracoes.get(id_servico, [self.duracao_padrao_s])[0]
+        # Sem guichê ativo no serviço, supõe que um vai atendê-lo
+        ativos = max(ativos, 1)
+        atendimentos = a_frente + min(ocupados, ativos) - ativos + 1
+        if atendimentos <= 0:
+            return 0.0
+        return atendimentos * duracao / ativos
+
+    def resumo(self, id_servico, a_frente, agora=None):
+        """Dicionário enviado em /gerar-senha e /estado."""
+        agora = agora or datetime.utcnow()
+        espera = round(self.estimar(id_servico, a_frente, agora))
+        with self._lock:
+            ativos, _ = self._guiches_ativos(id_servico, agora)
+            amostras = self._duracoes.get(id_servico, [None, 0])[1]
+        return {
+            'espera_estimada_s': espera,
+            'espera_estimada_min': math.ceil(espera / 60),
+            'a_frente': a_frente,
+            'guiches_ativos': ativos,
+            'amostras': amostras,
+        }
@@ -0,0 +1,247 @@
+# backend/eventos.py
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+
+logger = logging.getLogger(__name__)
+
+# Versão do formato dos eventos incrementais. Clientes que não reconhecem a
+# versão devem ignorar os deltas e recarregar o estado completo em /estado.
+VERSAO_PROTOCOLO = 1
+
+# Tipos de evento publicados em 'fila_eventos'
+SENHA_ADICIONADA = 'senha_adicionada'
+SENHA_CHAMADA = 'senha_chamada'
+SENHA_FINALIZADA = 'senha_finalizada'
+SENHA_REENCAMINHADA = 'senha_reencaminhada'
+# A fila em memória foi reconstruída (reparo): vai para todas as salas, sem senha,
+# e o cliente descarta o estado local e busca um novo /estado
+FILA_RECARREGADA = 'fila_recarregada'
+
+# Salas do Socket.IO: '{tipo_painel}:{escopo}', com escopo 'todos', 'servico:<id>'
+# ou 'guiche:<id>'. Cada sala recebe só os eventos do seu escopo; o totem não
+# mostra a fila e não recebe eventos.
+TIPOS_PAINEL = ('totem', 'monitor', 'atendente')
+TIPOS_SEM_EVENTOS = ('totem',)
+ESCOPO_TODOS = 'todos'
+# Sala de quem não se inscreve (inclusive clientes antigos): recebe tudo
+SALA_PADRAO = 'monitor:todos'
+
+
+def nome_sala(tipo, servico=None, guiche=None):
+    """Nome da sala de um painel; levanta ValueError para combinações inválidas."""
+    if tipo not in TIPOS_PAINEL:
+        raise ValueError(f'Tipo de painel desconhecido: {tipo}')
+    if servico is not None and guiche is not None:
+        raise ValueError('Informe o serviço ou o guichê, não os dois')
+    if servico is not None:
+        return f'{tipo}:servico:{int(servico)}'
+    if guiche is not None:
+        return f'{tipo}:guiche:{int(guiche)}'
+    return f'{tipo}:{ESCOPO_TODOS}'
+
+
+class PublicadorEventos:
+    """Publica mudanças da fila como eventos incrementais numerados.
+
+    Cada evento recebe um número de sequência crescente (`seq`). O cliente
+    aplica os eventos em ordem e, se perceber um salto na numeração (evento
+    perdido durante uma reconexão, por exemplo), busca um novo snapshot em
+    /estado, que informa o `seq` em que foi gerado.
+
+    A numeração vem de `versao` (VersaoLocal ou VersaoCompartilhada, em
+    versao_fila.py). A `epoca` identifica a numeração: se ela mudar (processo
+    único reiniciado, por exemplo), o cliente precisa de um novo snapshot.
+
+    Com `janela` > 0 (segundos), a emissão sai da requisição: um greenlet em
+    segundo plano junta tudo o que foi publicado durante a janela e emite uma
+    única mensagem 'fila_eventos' por sala com os eventos acumulados (e, com os
+    eventos legados, um único 'fila_atualizada' com o estado do fim da janela).
+    Com `janela` 0 a emissão é feita na hora, dentro da requisição.
+
+    Salas com escopo recebem só os eventos do escopo (calculado por
+    `escopos_senha`); os números dos demais vão em 'ignorados', para que o
+    cliente continue detectando saltos na numeração. Com vários workers,
+    `salas_remotas` informa as salas que podem ter clientes em outros processos.
+
+    Com `emitir_legado` ligado, os eventos antigos ('fila_atualizada' com a fila
+    inteira e 'senha_chamada') continuam sendo emitidos na sala padrão.
+    `contexto` (ex.: app.app_context) envolve a montagem desses payloads, que
+    consultam o banco. `ao_emitir(evento, sala, dados, destinatarios)` é
+    chamado a cada emissão (instrumentação).
+    """
+
+    def __init__(self, socketio, versao, emitir_legado=False, janela=0, contexto=None,
+                 escopos_senha=None, salas_remotas=None, ao_emitir=None):
+        self.socketio = socketio
+        self.versao = versao
+        self.emitir_legado = emitir_legado
+        self.janela = janela
+        self.contexto = contexto
+        self.escopos_senha = escopos_senha
+        self.salas_remotas = salas_remotas
+        self.ao_emitir = ao_emitir
+        self._lock = threading.Lock()
+        self._pendente = threading.Event()
+        self._emissor = None
+        self._lote = []  # (evento, escopos)
+        self._fila = None
+        self._senha_chamada = None
+        self._inscricoes = {}  # sid -> sala
+        self._metricas = {
+            'publicacoes': 0,             # chamadas a publicar()
+            'eventos': 0,                 # eventos incrementais publicados
+            'publicacoes_coalescidas': 0, # publicações somadas a uma janela já aberta
+            'janelas': 0,                 # descargas do emissor
+            'mensagens_emitidas': 0,      # socketio.emit efetivamente feitos
+            'eventos_filtrados': 0,       # eventos enviados só como número a salas fora do escopo
+        }
+
+    @property
+    def epoca(self):
+        return self.versao.epoca
+
+    @property
+    def seq(self):
+        """Último evento já refletido na fila em memória deste processo."""
+        return self.versao.aplicada
+
+    # ------------------------------------------------------------
+    # Salas
+    # ------------------------------------------------------------
+    def inscrever(self, sid, sala):
+        with self._lock:
+            self._inscricoes[sid] = sala
+
+    def cancelar_inscricao(self, sid):
+        with self._lock:
+            self._inscricoes.pop(sid, None)
+
+    def _salas(self):
+        with self._lock:
+            salas = set(self._inscricoes.values())
+        salas.add(SALA_PADRAO)
+        if self.salas_remotas is not None:
+            salas.update(self.salas_remotas())
+        return sorted(sala for sala in salas if sala.split(':', 1)[0] not in TIPOS_SEM_EVENTOS)
+
+    # ------------------------------------------------------------
+    # Publicação
+    # ------------------------------------------------------------
+    def publicar(self, eventos, fila=None, senha_chamada=None, guiche=None):
+        """Publica uma lista de (tipo, senha_dict).
+
+        `fila` e `senha_chamada` são funções chamadas apenas quando os eventos
+        legados estão ligados, no momento da emissão, para não montar payloads
+        completos à toa. `guiche` é o guichê que causou a mudança, quando a
+        senha não o traz mais (ex.: reencaminhada).
+        """
+        escopos = []
+        for _, senha in eventos:
+            escopos_evento = set(self.escopos_senha(senha)) if self.escopos_senha else set()
+            if guiche is not None:
+                escopos_evento.add(f'guiche:{guiche}')
+            escopos.append(escopos_evento)
+
+        ultimo = self.versao.avancar([(tipo, senha['id_senha']) for tipo, senha in eventos])
+        primeiro = ultimo - len(eventos) + 1
+        lote = [
+            {'v': VERSAO_PROTOCOLO, 'seq': primeiro + i, 'tipo': tipo, 'senha': senha}
+            for i, (tipo, senha) in enumerate(eventos)
+        ]
+        self._enfileirar(lote, escopos, fila, senha_chamada)
+        return lote
+
+    def ressincronizar(self, fila=None):
+        """Publica FILA_RECARREGADA depois de uma reconstrução da fila em memória.
+
+        O evento avança a numeração, o que invalida o snapshot de /estado em
+        cache (e o ETag guardado pelos clientes), e entra em todas as salas.
+        """
+        ultimo = self.versao.avancar([(FILA_RECARREGADA, 0)])
+        evento = {'v': VERSAO_PROTOCOLO, 'seq': ultimo, 'tipo': FILA_RECARREGADA, 'senha': None}
+        self._enfileirar([evento], [None], fila, None)
+        return evento
+
+    def _enfileirar(self, lote, escopos, fila, senha_chamada):
+        # `escopos` None: o evento vale para todas as salas
+        with self._lock:
+            self._metricas['publicacoes'] += 1
+            self._metricas['eventos'] += len(lote)
+            if self._pendente.is_set():
+                self._metricas['publicacoes_coalescidas'] += 1
+            self._lote.extend(zip(lote, escopos))
+            # Só o estado mais recente interessa aos clientes antigos
+            if fila is not None:
+                self._fila = fila
+            if senha_chamada is not None:
+                self._senha_chamada = senha_chamada
+            self._pendente.set()
+            if self.janela > 0 and self._emissor is None:
+                self._emissor = self.socketio.start_background_task(self._emitir_periodicamente)
+
+        if self.janela <= 0:
+            self.descarregar()
+
+    def _emitir_periodicamente(self):
+        while True:
+            self._pendente.wait()
+            self.socketio.sleep(self.janela)
+            try:
+                self.descarregar()
+            except Exception:
+                logger.exception('Erro ao emitir os eventos da fila')
+
+    def descarregar(self):
+        """Emite de uma vez tudo o que foi publicado desde a última descarga."""
+        with self._lock:
+            lote, fila, senha_chamada = self._lote, self._fila, self._senha_chamada
+            self._lote, self._fila, self._senha_chamada = [], None, None
+            self._pendente.clear()
+        if not lote:
+            return
+        # Publicações concorrentes podem ter entrado fora da ordem de seq
+        lote.sort(key=lambda item: item[0]['seq'])
+        completos = [evento for evento, _ in lote]
+        # Momento da emissão (relógio do servidor), para medir o atraso até os clientes
+        emitido_em = time.time()
+        filtrados = 0
+        emissoes = []
+        with self.contexto() if self.contexto else nullcontext():
+            for sala in self._salas():
+                escopo = sala.split(':', 1)[1]
+                if escopo == ESCOPO_TODOS:
+                    dados = {'epoca': self.epoca, 'emitido_em': emitido_em, 'eventos': completos}
+                else:
+                    dados = {'epoca': self.epoca, 'emitido_em': emitido_em, 'eventos': [], 'ignorados': []}
+                    for evento, escopos in lote:
+                        if escopos is None or escopo in escopos:
+                            dados['eventos'].append(evento)
+                        else:
+                            dados['ignorados'].append(evento['seq'])
+                    filtrados += len(dados['ignorados'])
+                emissoes.append(('fila_eventos', dados, sala))
+            if self.emitir_legado:
+                if senha_chamada is not None:
+                    emissoes.append(('senha_chamada', senha_chamada(), SALA_PADRAO))
+                if fila is not None:
+                    emissoes.append(('fila_atualizada', {'fila': fila()}, SALA_PADRAO))
+        if self.ao_emitir is not None:
+            # Clientes deste processo em cada sala (os de outros workers não entram na conta)
+            with self._lock:
+                clientes = Counter(self._inscricoes.values())
+        for evento, dados, sala in emissoes:
+            self.socketio.emit(evento, dados, to=sala)
+            if self.ao_emitir is not None:
+                self.ao_emitir(evento, sala, dados, clientes[sala])
+        with self._lock:
+            self._metricas['janelas'] += 1
+            self._metricas['mensagens_emitidas'] += len(emissoes)
+            self._metricas['eventos_filtrados'] += filtrados
+
+    def metricas(self):
+        with self._lock:
+            return {'janela_ms': int(self.janela * 1000), 'salas_inscritas': len(set(self._inscricoes.values())),
+                    'clientes': len(self._inscricoes), **self._metricas}
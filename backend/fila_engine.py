@@ -0,0 +1,172 @@
+# backend/fila_engine.py
+import heapq
+import threading
+
+
+class FilaEngine:
+    """Fila de senhas AGUARDANDO mantida em memória pelo processo.
+
+    A ordem de chamada é (prioritária primeiro, data de emissão, id). Existe um
+    heap global e um heap por serviço; remoções são preguiçosas (a entrada fica
+    no heap até chegar ao topo), então inserir, remover e retirar a próxima
+    custam O(log n). O banco continua sendo a fonte da verdade: a fila é
+    reconstruída a partir de `senhas` e atualizada depois de cada commit.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._limpar()
+        self.carregada = False
+
+    def _limpar(self):
+        self._ativas = {}  # id_senha -> (geracao, chave, id_servico, dados)
+        self._heap = []
+        self._heaps_servico = {}
+        self._contagem_servico = {}
+        self._contagem_prioritarias = {}
+        self._geracao = 0
+        self._listas_cache = {}  # id_servico (None = todos) -> lista ordenada
+
+    # ------------------------------------------------------------
+    # Carga e escrita
+    # ------------------------------------------------------------
+    def carregar(self, senhas):
+        """Reconstrói a fila. `senhas` é um iterável de tuplas
+        (id_senha, id_servico, is_prioritaria, data_hora_emissao, dados)."""
+        with self._lock:
+            self._limpar()
+            for id_senha, id_servico, is_prioritaria, data_hora_emissao, dados in senhas:
+                self._inserir(id_senha, id_servico, is_prioritaria, data_hora_emissao, dados)
+            self.carregada = True
+
+    def adicionar(self, id_senha, id_servico, is_prioritaria, data_hora_emissao, dados):
+        with self._lock:
+            self._inserir(id_senha, id_servico, is_prioritaria, data_hora_emissao, dados)
+
+    def _inserir(self, id_senha, id_servico, is_prioritaria, data_hora_emissao, dados):
+        if id_senha in self._ativas:
+            self._descontar(self._ativas[id_senha])
+        self._contagem_servico[id_servico] = self._contagem_servico.get(id_servico, 0) + 1
+        if is_prioritaria:
+            self._contagem_prioritarias[id_servico] = self._contagem_prioritarias.get(id_servico, 0) + 1
+        self._geracao += 1
+        chave = (0 if is_prioritaria else 1, data_hora_emissao, id_senha)
+        entrada = (chave, self._geracao, id_senha)
+        self._ativas[id_senha] = (self._geracao, chave, id_servico, dados)
+        heapq.heappush(self._heap, entrada)
+        heapq.heappush(self._heaps_servico.setdefault(id_servico, []), entrada)
+        self._listas_cache = {}
+
+    def remover(self, id_senha):
+        """Tira a senha da fila (se estiver nela) e devolve seus dados."""
+        with self._lock:
+            atual = self._ativas.pop(id_senha, None)
+            if atual is None:
+                return None
+            self._descontar(atual)
+            self._listas_cache = {}
+            self._compactar_se_necessario()
+            return atual[3]
+
+    def _descontar(self, ativa):
+        _, chave, id_servico, _ = ativa
+        contagens = [self._contagem_servico]
+        if chave[0] == 0:
+            contagens.append(self._contagem_prioritarias)
+        for contagem in contagens:
+            restantes = contagem.get(id_servico, 0) - 1
+            if restantes > 0:
+                contagem[id_servico] = restantes
+            else:
+                contagem.pop(id_servico, None)
+
+    # ------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------
+    def _heap_de(self, id_servico):
+        if id_servico is None:
+            return self._heap
+        return self._heaps_servico.get(id_servico, [])
+
+    def _descartar_obsoletas(self, heap):
+        # Entradas removidas (ou substituídas por uma geração mais nova) saem do topo.
+        while heap:
+            _, geracao, id_senha = heap[0]
+            atual = self._ativas.get(id_senha)
+            if atual is not None and atual[0] == geracao:
+                return id_senha
+            heapq.heappop(heap)
+        return None
+
+    def proxima(self, id_servico=None):
+        """Id da próxima senha a ser chamada, sem retirá-la da fila."""
+        with self._lock:
+            return self._descartar_obsoletas(self._heap_de(id_servico))
+
+    def retirar_proxima(self, id_servico=None):
+        """Retira a próxima senha e devolve a tupla (id_senha, id_servico,
+        is_prioritaria, data_hora_emissao, dados), a mesma aceita por `adicionar`
+        para devolvê-la à fila; None se a fila estiver vazia."""
+        with self._lock:
+            id_senha = self._descartar_obsoletas(self._heap_de(id_servico))
+            if id_senha is None:
+                return None
+            _, chave, id_servico_senha, _ = self._ativas[id_senha]
+            return id_senha, id_servico_senha, chave[0] == 0, chave[1], self.remover(id_senha)
+
+    def listar(self, id_servico=None):
+        """Dados das senhas aguardando em ordem de emissão (mesma ordem da rota /estado),
+        de todos os serviços ou só de `id_servico`."""
+        with self._lock:
+            lista = self._listas_cache.get(id_servico)
+            if lista is None:
+                ativas = self._ativas.values()
+                if id_servico is not None:
+                    ativas = [a for a in ativas if a[2] == id_servico]
+                lista = [a[3] for a in sorted(ativas, key=lambda a: (a[1][1], a[1][2]))]
+                self._listas_cache[id_servico] = lista
+            return lista
+
+    def tamanho(self, id_servico=None, prioritarias=False):
+        """Quantidade de senhas aguardando (só as prioritárias, se `prioritarias`)."""
+        with self._lock:
+            if id_servico is None:
+                if prioritarias:
+                    return sum(self._contagem_prioritarias.values())
+                return len(self._ativas)
+            contagem = self._contagem_prioritarias if prioritarias else self._contagem_servico
+            return contagem.get(id_servico, 0)
+
+    def __contains__(self, id_senha):
+        return id_senha in self._ativas
+
+    # ------------------------------------------------------------
+    # Manutenção
+    # ------------------------------------------------------------
+    def _compactar_se_necessario(self):
+        # Evita que entradas obsoletas cresçam sem limite quando as remoções
+        # acontecem longe do topo (ex.: senhas reencaminhadas ou canceladas).
+        if len(self._heap) <= 64 or len(self._heap) <= 2 * len(self._ativas):
+            return
+        self._heap = [(chave, geracao, id_senha) for id_senha, (geracao, chave, _, _) in self._ativas.items()]
+        heapq.heapify(self._heap)
+        self._heaps_servico = {}
+        for id_senha, (geracao, chave, id_servico, _) in self._ativas.items():
+            self._heaps_servico.setdefault(id_servico, []).append((chave, geracao, id_senha))
+        for heap in self._heaps_servico.values():
+            heapq.heapify(heap)
+
+    def verificar_consistencia(self, ids_banco):
+        """Compara a fila em memória com os ids AGUARDANDO lidos do banco."""
+        with self._lock:
+            ids_memoria = set(self._ativas)
+        ids_banco = set(ids_banco)
+        somente_memoria = sorted(ids_memoria - ids_banco)
+        somente_banco = sorted(ids_banco - ids_memoria)
+        return {
+            'consistente': not somente_memoria and not somente_banco,
+            'total_memoria': len(ids_memoria),
+            'total_banco': len(ids_banco),
+            'somente_memoria': somente_memoria,
+            'somente_banco': somente_banco,
+        }
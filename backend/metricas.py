@@ -0,0 +1,219 @@
+# backend/metricas.py
+import json
+import logging
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Limites (em segundos) dos histogramas de duração e (em comandos) do de SQL por requisição
+LIMITES_DURACAO_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50)
+LIMITES_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# Rótulo dos comandos SQL feitos fora de requisições (emissor, estatísticas, arquivamento)
+ROTA_SEGUNDO_PLANO = '(segundo plano)'
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos(nomes, valores):
+    if not nomes:
+        return ''
+    return '{' + ','.join(f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)) + '}'
+
+
+class _Serie:
+    def __init__(self, nome, ajuda, tipo, rotulos):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.tipo = tipo
+        self.rotulos = tuple(rotulos)
+        self._valores = {}  # valores dos rótulos -> valor (ou [contagens, soma])
+
+    def _cabecalho(self):
+        return [f'# HELP {self.nome} {self.ajuda}', f'# TYPE {self.nome} {self.tipo}']
+
+
+class Contador(_Serie):
+    def __init__(self, nome, ajuda, rotulos=()):
+        super().__init__(nome, ajuda, 'counter', rotulos)
+
+    def inc(self, quantidade=1, *valores):
+        self._valores[valores] = self._valores.get(valores, 0) + quantidade
+
+    def exportar(self):
+        return self._cabecalho() + [f'{self.nome}{_rotulos(self.rotulos, v)} {total}' for v, total in self._valores.items()]
+
+
+class Histograma(_Serie):
+    def __init__(self, nome, ajuda, limites, rotulos=()):
+        super().__init__(nome, ajuda, 'histogram', rotulos)
+        self.limites = tuple(limites)
+
+    def observar(self, valor, *valores):
+        atual = self._valores.get(valores)
+        if atual is None:
+            atual = self._valores[valores] = [[0] * (len(self.limites) + 1), 0.0]
+        # Faixa do valor (a última é +Inf); as contagens acumuladas saem na exportação
+        indice = next((i for i, limite in enumerate(self.limites) if valor <= limite), len(self.limites))
+        atual[0][indice] += 1
+        atual[1] += valor
+
+    def exportar(self):
+        linhas = self._cabecalho()
+        rotulos_le = self.rotulos + ('le',)
+        for valores, (contagens, soma) in self._valores.items():
+            acumulado = 0
+            for limite, quantidade in zip(self.limites + ('+Inf',), contagens):
+                acumulado += quantidade
+                linhas.append(f'{self.nome}_bucket{_rotulos(rotulos_le, valores + (limite,))} {acumulado}')
+            linhas.append(f'{self.nome}_sum{_rotulos(self.rotulos, valores)} {soma}')
+            linhas.append(f'{self.nome}_count{_rotulos(self.rotulos, valores)} {acumulado}')
+        return linhas
+
+
+class Medidor(_Serie):
+    """Valor lido na hora da coleta: `coletar()` devolve [(valores dos rótulos, valor)]."""
+
+    def __init__(self, nome, ajuda, coletar, rotulos=(), tipo='gauge'):
+        super().__init__(nome, ajuda, tipo, rotulos)
+        self.coletar = coletar
+
+    def exportar(self):
+        return self._cabecalho() + [f'{self.nome}{_rotulos(self.rotulos, v)} {valor}' for v, valor in self.coletar()]
+
+
+class Metricas:
+    """Instrumentação do app exposta no formato texto do Prometheus (GET /metrics).
+
+    Mede, por rota: duração das requisições (histograma, com método e status),
+    quantidade e duração dos comandos SQL de cada requisição (eventos
+    before/after_cursor_execute do SQLAlchemy) e as emissões do Socket.IO (por
+    evento: mensagens, bytes e clientes locais alcançados). Medidores lidos na
+    coleta (profundidade da fila por serviço, contadores do publicador) são
+    registrados com `medidor`.
+
+    O tamanho do payload exige serializá-lo de novo, então só é medido em uma
+    a cada `amostra_bytes` emissões de cada evento (a primeira sempre entra).
+
+    Com `limite_lento_s` > 0, toda requisição mais lenta que o limite é
+    registrada no log com os `max_sql_log` comandos SQL mais demorados.
+    """
+
+    def __init__(self, limite_lento_s=0, max_sql_log=5, amostra_bytes=20):
+        self.limite_lento_s = limite_lento_s
+        self.max_sql_log = max_sql_log
+        self.amostra_bytes = max(1, amostra_bytes)
+        self._emissoes_por_evento = {}
+        self._lock = threading.Lock()
+        self._series = []
+        self.requisicoes = self._registrar(Histograma(
+            'fila_http_requisicao_segundos', 'Duração das requisições HTTP', LIMITES_DURACAO_S,
+            ('metodo', 'rota', 'status')))
+        self.consultas_requisicao = self._registrar(Histograma(
+            'fila_sql_comandos_por_requisicao', 'Comandos SQL executados por requisição', LIMITES_CONSULTAS, ('rota',)))
+        self.consultas = self._registrar(Contador(
+            'fila_sql_comandos_total', 'Comandos SQL executados', ('rota',)))
+        self.duracao_consultas = self._registrar(Contador(
+            'fila_sql_segundos_total', 'Tempo gasto em comandos SQL', ('rota',)))
+        self.emissoes = self._registrar(Contador(
+            'fila_socketio_emissoes_total', 'Mensagens emitidas pelo Socket.IO (uma por sala)', ('evento',)))
+        self.destinatarios = self._registrar(Contador(
+            'fila_socketio_destinatarios_total', 'Entregas a clientes conectados neste processo', ('evento',)))
+        self.bytes_emissoes = self._registrar(Histograma(
+            'fila_socketio_payload_bytes', 'Tamanho do payload (JSON) das emissões amostradas', LIMITES_BYTES, ('evento',)))
+
+    def _registrar(self, serie):
+        self._series.append(serie)
+        return serie
+
+    def medidor(self, nome, ajuda, coletar, rotulos=(), tipo='gauge'):
+        return self._registrar(Medidor(nome, ajuda, coletar, rotulos, tipo))
+
+    # ------------------------------------------------------------
+    # Coleta
+    # ------------------------------------------------------------
+    def instrumentar(self, app, db):
+        """Liga os ganchos de requisição e de SQL ao app e cria a rota GET /metrics."""
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._antes_sql)
+            event.listen(db.engine, 'after_cursor_execute', self._depois_sql)
+        app.before_request(self._inicio_requisicao)
+        app.after_request(self._fim_requisicao)
+        app.add_url_rule('/metrics', 'metrics', self.exportar_resposta)
+
+    def _antes_sql(self, conexao, cursor, comando, parametros, contexto, executemany):
+        conexao.info.setdefault('metricas_inicio', []).append(time.perf_counter())
+
+    def _depois_sql(self, conexao, cursor, comando, parametros, contexto, executemany):
+        duracao = time.perf_counter() - conexao.info['metricas_inicio'].pop()
+        if has_request_context() and 'metricas_sql' in g:
+            g.metricas_sql.append((duracao, comando))
+            return
+        with self._lock:
+            self.consultas.inc(1, ROTA_SEGUNDO_PLANO)
+            self.duracao_consultas.inc(duracao, ROTA_SEGUNDO_PLANO)
+
+    def _inicio_requisicao(self):
+        g.metricas_inicio = time.perf_counter()
+        g.metricas_sql = []
+
+    def _fim_requisicao(self, resposta):
+        if 'metricas_inicio' not in g:
+            return resposta
+        duracao = time.perf_counter() - g.metricas_inicio
+        # A regra (ex.: /<path:path>) e não o caminho, para não criar uma série por URL
+        rota = request.url_rule.rule if request.url_rule else '(sem rota)'
+        comandos = g.metricas_sql
+        with self._lock:
+            self.requisicoes.observar(duracao, request.method, rota, resposta.status_code)
+            self.consultas_requisicao.observar(len(comandos), rota)
+            self.consultas.inc(len(comandos), rota)
+            self.duracao_consultas.inc(sum(d for d, _ in comandos), rota)
+        if self.limite_lento_s and duracao >= self.limite_lento_s:
+            self._registrar_lenta(rota, duracao, resposta.status_code, comandos)
+        return resposta
+
+    def _registrar_lenta(self, rota, duracao, status, comandos):
+        lentos = sorted(comandos, key=lambda c: c[0], reverse=True)[:self.max_sql_log]
+        detalhes = ''.join(f'\n  {d * 1000:.1f} ms: {" ".join(sql.split())[:500]}' for d, sql in lentos)
+        logger.warning('Requisição lenta: %s %s -> %s em %.1f ms, %d comandos SQL (%.1f ms)%s',
+                       request.method, request.full_path.rstrip('?'), status, duracao * 1000,
+                       len(comandos), sum(d for d, _ in comandos) * 1000, detalhes)
+
+    def registrar_emissao(self, evento, sala, dados, destinatarios):
+        """Gancho do PublicadorEventos, chamado a cada socketio.emit."""
+        with self._lock:
+            self.emissoes.inc(1, evento)
+            self.destinatarios.inc(destinatarios, evento)
+            vistas = self._emissoes_por_evento.get(evento, 0)
+            self._emissoes_por_evento[evento] = vistas + 1
+        if vistas % self.amostra_bytes:
+            return
+        tamanho = len(json.dumps(dados, separators=(',', ':'), default=str))
+        with self._lock:
+            self.bytes_emissoes.observar(tamanho, evento)
+
+    # ------------------------------------------------------------
+    # Exportação
+    # ------------------------------------------------------------
+    def exportar(self):
+        linhas = []
+        with self._lock:
+            for serie in self._series:
+                if not isinstance(serie, Medidor):
+                    linhas += serie.exportar()
+        # Medidores consultam outros objetos: ficam fora da trava
+        for serie in self._series:
+            if isinstance(serie, Medidor):
+                linhas += serie.exportar()
+        return '\n'.join(linhas) + '\n'
+
+    def exportar_resposta(self):
+        return Response(self.exportar(), mimetype='text/plain; version=0.0.4')
@@ -1,6 +1,10 @@
 # backend/models/__init__.py
 # Importa cada modelo para que eles sejam acessíveis diretamente do pacote 'models'
+# (e registrados no db.metadata usado pelo create_all)
+from .estatisticas import EstatisticaAtendimento, EstatisticaFaixa
+from .fila import FilaEventoLog, FilaVersao, SequenciaServico
 from .guiche import Guiche
 from .senha import Senha
+from .senha_historico import SenhaHistorico
 from .servico import Servico
 from .usuario import Usuario
@@ -0,0 +1,27 @@
+# backend/models/estatisticas.py
+from database import db
+
+class EstatisticaAtendimento(db.Model):
+    # Contagens e somas de tempos por balde (5min/dia) e dimensão (geral/serviço/guichê/atendente),
+    # mantidas por estatisticas.py; a rota /estatisticas lê só estas tabelas
+    __tablename__ = 'estatisticas_atendimento'
+    granularidade = db.Column(db.String(10), primary_key=True)
+    inicio = db.Column(db.DateTime, primary_key=True)
+    dimensao = db.Column(db.String(20), primary_key=True)
+    id_dimensao = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    emitidas = db.Column(db.Integer, nullable=False, default=0)
+    chamadas = db.Column(db.Integer, nullable=False, default=0)
+    atendidas = db.Column(db.Integer, nullable=False, default=0)
+    soma_espera_s = db.Column(db.Float, nullable=False, default=0)
+    soma_atendimento_s = db.Column(db.Float, nullable=False, default=0)
+
+class EstatisticaFaixa(db.Model):
+    # Histograma dos tempos de espera/atendimento de cada balde (faixas em estatisticas.FAIXAS_S)
+    __tablename__ = 'estatisticas_faixas'
+    granularidade = db.Column(db.String(10), primary_key=True)
+    inicio = db.Column(db.DateTime, primary_key=True)
+    dimensao = db.Column(db.String(20), primary_key=True)
+    id_dimensao = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    metrica = db.Column(db.String(20), primary_key=True)
+    faixa = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
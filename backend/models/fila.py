@@ -0,0 +1,23 @@
+# backend/models/fila.py
+from database import db
+
+class SequenciaServico(db.Model):
+    # Contador atômico do último número emitido por serviço (e por dia, com reset diário)
+    __tablename__ = 'sequencias_servico'
+    id_servico = db.Column(db.Integer, db.ForeignKey('servicos.id_servico'), primary_key=True)
+    data_referencia = db.Column(db.Date, primary_key=True)
+    ultimo_valor = db.Column(db.Integer, nullable=False, default=0)
+
+class FilaVersao(db.Model):
+    # Linha única com a versão da fila compartilhada entre workers (FILA_MULTIPROCESSO)
+    __tablename__ = 'fila_versao'
+    id = db.Column(db.Integer, primary_key=True)
+    versao = db.Column(db.BigInteger, nullable=False, default=0)
+    epoca = db.Column(db.String(16), nullable=False)
+
+class FilaEventoLog(db.Model):
+    # Senhas alteradas em cada versão, lidas pelos outros workers para atualizar a fila em memória
+    __tablename__ = 'fila_eventos_log'
+    seq = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    tipo = db.Column(db.String(30), nullable=False)
+    id_senha = db.Column(db.Integer, nullable=False)
@@ -3,16 +3,18 @@ from database import db
 
 class Guiche(db.Model):
     __tablename__ = 'guiches' # Nome da tabela no banco de dados
-    id_guiche = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    numero = db.Column(db.Integer, unique=True, nullable=False) # Mudado para Integer
-    descricao = db.Column(db.String(255), nullable=True)
+    id_guiche = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(100), nullable=False)
+    descricao = db.Column(db.String(255))
+    is_disponivel = db.Column(db.Boolean, nullable=False, default=True)
 
     def __repr__(self):
-        return f"<Guiche {self.numero}>"
+        return f"<Guiche {self.nome}>"
 
     def to_dict(self):
         return {
             "id_guiche": self.id_guiche,
-            "numero": self.numero,
-            "descricao": self.descricao
+            "nome": self.nome,
+            "descricao": self.descricao,
+            "is_disponivel": self.is_disponivel
         }
@@ -4,48 +4,54 @@ from datetime import datetime
 
 class Senha(db.Model):
     __tablename__ = 'senhas' # Nome da tabela no banco de dados
-    id_senha = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    id_senha = db.Column(db.Integer, primary_key=True)
     id_servico = db.Column(db.Integer, db.ForeignKey('servicos.id_servico'), nullable=False)
     numero_sequencial = db.Column(db.Integer, nullable=False)
     prefixo = db.Column(db.String(5), nullable=False)
-    senha_completa = db.Column(db.String(20), unique=True, nullable=False)
-    data_hora_emissao = db.Column(db.DateTime(timezone=True), nullable=False, default=datetime.utcnow) # Usar timezone=True
-    status = db.Column(db.String(20), nullable=False, default='AGUARDANDO') # AGUARDANDO, CHAMANDO, ATENDIDA, PAUSADA, CANCELADA, REENCAMINHADA
+    senha_completa = db.Column(db.String(20), nullable=False, unique=True)
+    status = db.Column(db.String(50), nullable=False, default='AGUARDANDO') # AGUARDANDO, CHAMANDO, ATENDIDA, CANCELADA
     is_prioritaria = db.Column(db.Boolean, nullable=False, default=False)
-    id_guiche_atendimento = db.Column(db.Integer, db.ForeignKey('guiches.id_guiche'), nullable=True)
-    id_atendente = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'), nullable=True)
-    data_hora_chamada = db.Column(db.DateTime(timezone=True), nullable=True)
-    data_hora_inicio_atendimento = db.Column(db.DateTime(timezone=True), nullable=True)
-    data_hora_fim_atendimento = db.Column(db.DateTime(timezone=True), nullable=True)
-    observacoes = db.Column(db.Text, nullable=True)
-    origem_reencaminhamento = db.Column(db.Integer, db.ForeignKey('guiches.id_guiche'), nullable=True)
-    id_senha_anterior = db.Column(db.Integer, db.ForeignKey('senhas.id_senha'), nullable=True)
-
-    # Relacionamentos
-    servico = db.relationship('Servico', backref='senhas_associadas')
-    guiche_atendimento = db.relationship('Guiche', foreign_keys=[id_guiche_atendimento], backref='senhas_atendidas')
-    atendente = db.relationship('Usuario', backref='senhas_atendidas_por_ele')
-    guiche_origem = db.relationship('Guiche', foreign_keys=[origem_reencaminhamento], backref='senhas_reencaminhadas_de')
-    senha_anterior_obj = db.relationship('Senha', remote_side=[id_senha], backref='senha_seguinte')
+    data_hora_emissao = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    data_hora_chamada = db.Column(db.DateTime)
+    data_hora_fim_atendimento = db.Column(db.DateTime)
+    id_guiche_atendimento = db.Column(db.Integer)
+    id_atendente = db.Column(db.Integer)
+    localizacao = db.Column(db.String(255))
 
+    servico = db.relationship('Servico', backref=db.backref('senhas', lazy=True))
 
     def __repr__(self):
         return f"<Senha {self.senha_completa} - Status: {self.status}>"
 
     def to_dict(self):
         return {
-            "id_senha": self.id_senha,
-            "numero_senha": self.senha_completa,
-            "id_servico": self.id_servico,
-            "id_guiche": self.id_guiche_atendimento,
-            "data_geracao": self.data_hora_emissao.isoformat() if self.data_hora_emissao else None,
-            "data_chamada": self.data_hora_chamada.isoformat() if self.data_hora_chamada else None,
-            "data_inicio_atendimento": self.data_hora_inicio_atendimento.isoformat() if self.data_hora_inicio_atendimento else None,
-            "data_fim_atendimento": self.data_hora_fim_atendimento.isoformat() if self.data_hora_fim_atendimento else None,
-            "status": self.status,
-            "is_prioritaria": self.is_prioritaria,
-            "id_atendente": self.id_atendente,
-            "observacoes": self.observacoes,
-            "origem_reencaminhamento": self.origem_reencaminhamento,
-            "id_senha_anterior": self.id_senha_anterior
-        }
\ No newline at end of file
+            'id_senha': self.id_senha,
+            'numero_senha': self.senha_completa,
+            'servico': self.servico.nome_servico,
+            'is_prioritaria': self.is_prioritaria,
+            'status': self.status,
+            'data_hora_emissao': self.data_hora_emissao.isoformat() if self.data_hora_emissao else None,
+            'data_hora_chamada': self.data_hora_chamada.isoformat() if self.data_hora_chamada else None,
+            'guiche': self.id_guiche_atendimento,
+            'localizacao': self.localizacao
+        }
+
+# Índices das consultas quentes. Os parciais indexam só as poucas linhas vivas
+# (AGUARDANDO/CHAMANDO), então continuam pequenos com milhões de senhas antigas.
+_APENAS_AGUARDANDO = Senha.status == 'AGUARDANDO'
+_APENAS_CHAMANDO = Senha.status == 'CHAMANDO'
+_CHAMANDO_OU_ATENDIDA = Senha.status.in_(['CHAMANDO', 'ATENDIDA'])
+# Ordem de chamada: prioritárias primeiro, depois por emissão (também usado para montar a fila)
+db.Index('ix_senhas_aguardando_ordem', Senha.is_prioritaria.desc(), Senha.data_hora_emissao,
+         postgresql_where=_APENAS_AGUARDANDO, sqlite_where=_APENAS_AGUARDANDO)
+# Guichês que atendem um único serviço
+db.Index('ix_senhas_aguardando_servico_ordem', Senha.id_servico, Senha.is_prioritaria.desc(), Senha.data_hora_emissao,
+         postgresql_where=_APENAS_AGUARDANDO, sqlite_where=_APENAS_AGUARDANDO)
+# Senha em atendimento por guichê
+db.Index('ix_senhas_chamando_guiche', Senha.id_guiche_atendimento, Senha.data_hora_chamada.desc(),
+         postgresql_where=_APENAS_CHAMANDO, sqlite_where=_APENAS_CHAMANDO)
+# Últimas senhas chamadas (ORDER BY data_hora_chamada DESC LIMIT 5)
+db.Index('ix_senhas_ultimas_chamadas', Senha.data_hora_chamada.desc(),
+         postgresql_where=_CHAMANDO_OU_ATENDIDA, sqlite_where=_CHAMANDO_OU_ATENDIDA)
+# Maior número emitido por serviço (semente do contador de sequência)
+db.Index('ix_senhas_servico_sequencial', Senha.id_servico, Senha.numero_sequencial)
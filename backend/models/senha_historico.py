@@ -0,0 +1,27 @@
+# backend/models/senha_historico.py
+from database import db
+from datetime import datetime
+
+class SenhaHistorico(db.Model):
+    # Senhas encerradas (ATENDIDA/CANCELADA) movidas de `senhas` pelo arquivamento.
+    # No PostgreSQL a tabela é particionada por mês de emissão (partições criadas
+    # sob demanda por arquivamento.py); relatórios usam a view senhas_relatorio.
+    __tablename__ = 'senhas_historico'
+    __table_args__ = {'postgresql_partition_by': 'RANGE (data_hora_emissao)'}
+    id_senha = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    id_servico = db.Column(db.Integer, nullable=False)
+    numero_sequencial = db.Column(db.Integer, nullable=False)
+    prefixo = db.Column(db.String(5), nullable=False)
+    senha_completa = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(50), nullable=False)
+    is_prioritaria = db.Column(db.Boolean, nullable=False)
+    # Faz parte da chave primária porque é a chave de particionamento
+    data_hora_emissao = db.Column(db.DateTime, primary_key=True)
+    data_hora_chamada = db.Column(db.DateTime)
+    data_hora_fim_atendimento = db.Column(db.DateTime)
+    id_guiche_atendimento = db.Column(db.Integer)
+    id_atendente = db.Column(db.Integer)
+    localizacao = db.Column(db.String(255))
+    data_hora_arquivamento = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+db.Index('ix_senhas_historico_servico_emissao', SenhaHistorico.id_servico, SenhaHistorico.data_hora_emissao)
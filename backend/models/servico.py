@@ -3,18 +3,16 @@ from database import db
 
 class Servico(db.Model):
     __tablename__ = 'servicos' # Nome da tabela no banco de dados
-    id_servico = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    nome = db.Column(db.String(100), unique=True, nullable=False)
-    prefixo_senha = db.Column(db.String(5), unique=True, nullable=False)
-    ativo = db.Column(db.Boolean, nullable=False, default=True)
+    id_servico = db.Column(db.Integer, primary_key=True)
+    nome_servico = db.Column(db.String(100), nullable=False, unique=True)
+    prefixo_senha = db.Column(db.String(5), nullable=False)
 
     def __repr__(self):
-        return f"<Servico {self.nome}>"
+        return f'<Servico {self.nome_servico}>'
 
     def to_dict(self):
         return {
-            "id_servico": self.id_servico,
-            "nome": self.nome,
-            "prefixo_senha": self.prefixo_senha,
-            "ativo": self.ativo
-        }
\ No newline at end of file
+            'id_servico': self.id_servico,
+            'nome_servico': self.nome_servico,
+            'prefixo_senha': self.prefixo_senha,
+        }
@@ -0,0 +1,116 @@
+# backend/sequencias.py
+import threading
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+# Data usada como chave quando a numeração não reinicia a cada dia
+DATA_SEM_RESET = date(2000, 1, 1)
+
+# Reserva atômica: cria o contador do dia ou soma `quantidade` ao existente e
+# devolve o último número reservado. Funciona em PostgreSQL e SQLite >= 3.35.
+_RESERVAR = text(
+    "INSERT INTO sequencias_servico (id_servico, data_referencia, ultimo_valor) "
+    "VALUES (:id_servico, :data_referencia, :quantidade) "
+    "ON CONFLICT (id_servico, data_referencia) "
+    "DO UPDATE SET ultimo_valor = sequencias_servico.ultimo_valor + excluded.ultimo_valor "
+    "RETURNING ultimo_valor"
+)
+
+# Na primeira vez que um contador é usado ele parte do maior número já emitido
+# (inclusive entre as senhas já arquivadas), para não repetir senhas de antes da
+# existência da tabela de sequências. O ON CONFLICT não evita a leitura do
+# histórico, por isso a semeadura só roda quando o contador ainda não existe.
+_CONTADOR_EXISTE = text(
+    "SELECT 1 FROM sequencias_servico WHERE id_servico = :id_servico AND data_referencia = :data_referencia"
+)
+
+_SEMEAR = text(
+    "INSERT INTO sequencias_servico (id_servico, data_referencia, ultimo_valor) "
+    "SELECT :id_servico, :data_referencia, COALESCE(MAX(numero_sequencial), 0) FROM ("
+    "SELECT numero_sequencial FROM senhas WHERE id_servico = :id_servico AND data_hora_emissao >= :desde "
+    "UNION ALL "
+    "SELECT numero_sequencial FROM senhas_historico WHERE id_servico = :id_servico AND data_hora_emissao >= :desde"
+    ") AS emitidas WHERE TRUE "  # o WHERE evita que o SQLite leia o ON CONFLICT como condição de JOIN
+    "ON CONFLICT (id_servico, data_referencia) DO NOTHING"
+)
+
+
+class AlocadorSequencias:
+    """Entrega números sequenciais de senha por serviço.
+
+    Cada reserva é um único INSERT ... ON CONFLICT DO UPDATE ... RETURNING numa
+    conexão própria (commit imediato), então totens concorrentes nunca recebem
+    o mesmo número e o custo não depende do tamanho de `senhas`.
+
+    Com `tamanho_bloco` > 1 o processo reserva vários números de uma vez e os
+    entrega da memória; números de um bloco não usado até o fim do dia (ou do
+    processo) ficam como lacunas na numeração.
+    """
+
+    def __init__(self, db, tamanho_bloco=1, reset_diario=False):
+        self.db = db
+        self.tamanho_bloco = max(1, int(tamanho_bloco))
+        self.reset_diario = reset_diario
+        self._lock = threading.Lock()
+        self._blocos = {}  # (id_servico, data_referencia) -> [proximo, ultimo]
+        self._semeados = set()
+
+    def _data_referencia(self):
+        return datetime.utcnow().date() if self.reset_diario else DATA_SEM_RESET
+
+    def alocar(self, id_servico, quantidade=1):
+        """Devolve uma lista com `quantidade` números novos para o serviço."""
+        chave = (id_servico, self._data_referencia())
+        with self._lock:
+            numeros = self._retirar_do_bloco(chave, quantidade)
+        falta = quantidade - len(numeros)
+        if falta:
+            reservados = max(falta, self.tamanho_bloco)
+            ultimo = self._reservar(chave, reservados)
+            primeiro = ultimo - reservados + 1
+            numeros.extend(range(primeiro, primeiro + falta))
+            if reservados > falta:
+                with self._lock:
+                    # Guarda a sobra como bloco local; se outro greenlet já guardou
+                    # um bloco nesse meio tempo, a sobra vira lacuna.
+                    bloco = self._blocos.get(chave)
+                    if bloco is None or bloco[0] > bloco[1]:
+                        self._blocos[chave] = [primeiro + falta, ultimo]
+        return numeros
+
+    def _retirar_do_bloco(self, chave, quantidade):
+        bloco = self._blocos.get(chave)
+        if bloco is None:
+            return []
+        fim = min(bloco[0] + quantidade - 1, bloco[1])
+        numeros = list(range(bloco[0], fim + 1))
+        bloco[0] = fim + 1
+        if bloco[0] > bloco[1]:
+            del self._blocos[chave]
+        return numeros
+
+    def _reservar(self, chave, quantidade):
+        id_servico, data_referencia = chave
+        parametros = {'id_servico': id_servico, 'data_referencia': data_referencia}
+        with self.db.engine.begin() as conexao:
+            # Cada processo confere uma vez por contador; o histórico só é lido se ele não existir
+            if chave not in self._semeados and conexao.execute(_CONTADOR_EXISTE, parametros).first() is None:
+                desde = datetime.combine(data_referencia, datetime.min.time()) if self.reset_diario else datetime.min
+                conexao.execute(_SEMEAR, {**parametros, 'desde': desde})
+            ultimo = conexao.execute(_RESERVAR, {**parametros, 'quantidade': quantidade}).scalar_one()
+        self._semeados.add(chave)
+        return ultimo
+
+
+def preparar_reset_diario(db):
+    """Com reset diário, `senha_completa` (ex.: A-001) se repete entre dias. Troca
+    a unicidade global dessa coluna por uma unicidade por serviço e dia."""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    with db.engine.begin() as conexao:
+        conexao.execute(text("ALTER TABLE senhas DROP CONSTRAINT IF EXISTS senhas_senha_completa_key"))
+        conexao.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_senhas_servico_dia_numero "
+            "ON senhas (id_servico, CAST(data_hora_emissao AS date), numero_sequencial)"
+        ))
@@ -0,0 +1,87 @@
+# backend/serializacao.py
+import threading
+
+
+class SerializadorSenhas:
+    """Monta os dicionários de senha enviados em /estado e nos eventos.
+
+    As listagens buscam só as colunas necessárias (tuplas, sem instanciar objetos
+    do ORM) e o nome do serviço vem de um cache em memória, em vez do
+    relacionamento `Senha.servico`, que dispara uma consulta extra por senha.
+    O formato é o mesmo de `Senha.to_dict`.
+    """
+
+    def __init__(self, db, Senha, Servico):
+        self.db = db
+        self.Senha = Senha
+        self.Servico = Servico
+        self.colunas = (
+            Senha.id_senha, Senha.senha_completa, Senha.id_servico, Senha.is_prioritaria, Senha.status,
+            Senha.data_hora_emissao, Senha.data_hora_chamada, Senha.id_guiche_atendimento, Senha.localizacao,
+            # Não vai para o dicionário; usada pela estimativa de espera ao sincronizar workers
+            Senha.data_hora_fim_atendimento,
+        )
+        self._lock = threading.Lock()
+        self._nomes_servico = {}
+
+    # ------------------------------------------------------------
+    # Cache de nomes de serviço
+    # ------------------------------------------------------------
+    def _recarregar_nomes(self):
+        # A tabela de serviços é pequena: é relida inteira
+        nomes = dict(self.db.session.query(self.Servico.id_servico, self.Servico.nome_servico))
+        with self._lock:
+            self._nomes_servico = nomes
+        return nomes
+
+    def nome_servico(self, id_servico):
+        nome = self._nomes_servico.get(id_servico)
+        if nome is None:
+            # Serviço novo (talvez criado por outro processo)
+            nome = self._recarregar_nomes().get(id_servico)
+        return nome
+
+    def id_servico(self, nome_servico):
+        """Caminho inverso de `nome_servico` (usado para rotear eventos por serviço)."""
+        for id_servico, nome in self._nomes_servico.items():
+            if nome == nome_servico:
+                return id_servico
+        nomes = self._recarregar_nomes()
+        return next((id_servico for id_servico, nome in nomes.items() if nome == nome_servico), None)
+
+    def ids_servico(self):
+        """Ids de todos os serviços cadastrados (carrega o cache no primeiro uso)."""
+        return list(self._nomes_servico or self._recarregar_nomes())
+
+    def registrar_servico(self, servico):
+        with self._lock:
+            self._nomes_servico = {**self._nomes_servico, servico.id_servico: servico.nome_servico}
+
+    # ------------------------------------------------------------
+    # Consultas e serialização
+    # ------------------------------------------------------------
+    def consultar(self, *filtros, ordem=(), limite=None):
+        """Executa um SELECT só com as colunas serializadas e devolve as linhas."""
+        consulta = self.db.select(*self.colunas).where(*filtros).order_by(*ordem)
+        if limite is not None:
+            consulta = consulta.limit(limite)
+        return self.db.session.execute(consulta).all()
+
+    def para_dict(self, senha):
+        """Serializa uma linha de `consultar` ou uma instância de Senha."""
+        emissao = senha.data_hora_emissao
+        chamada = senha.data_hora_chamada
+        return {
+            'id_senha': senha.id_senha,
+            'numero_senha': senha.senha_completa,
+            'servico': self.nome_servico(senha.id_servico),
+            'is_prioritaria': senha.is_prioritaria,
+            'status': senha.status,
+            'data_hora_emissao': emissao.isoformat() if emissao else None,
+            'data_hora_chamada': chamada.isoformat() if chamada else None,
+            'guiche': senha.id_guiche_atendimento,
+            'localizacao': senha.localizacao
+        }
+
+    def listar(self, *filtros, ordem=(), limite=None):
+        return [self.para_dict(linha) for linha in self.consultar(*filtros, ordem=ordem, limite=limite)]
@@ -0,0 +1,99 @@
+# backend/versao_fila.py
+import threading
+import uuid
+
+from sqlalchemy import text
+
+
+class VersaoLocal:
+    """Versão da fila mantida só neste processo (deploy com um único worker).
+
+    `versao` é o último número de evento emitido e `aplicada` a versão já
+    refletida na fila em memória; com um único processo as duas coincidem.
+    """
+    compartilhada = False
+
+    def __init__(self):
+        self.epoca = uuid.uuid4().hex[:8]
+        self.aplicada = 0
+
+    def avancar(self, eventos):
+        self.aplicada += len(eventos)
+        return self.aplicada
+
+    def novidades(self):
+        return []
+
+
+class VersaoCompartilhada:
+    """Versão da fila guardada no banco e comum a todos os workers/instâncias.
+
+    Cada avanço incrementa `fila_versao` (UPDATE ... RETURNING, serializado pela
+    trava da linha) e registra em `fila_eventos_log` quais senhas mudaram. Os
+    outros workers leem esse log a cada requisição para atualizar a fila em
+    memória, sem reconstruí-la inteira.
+    """
+    compartilhada = True
+
+    def __init__(self, db, retencao=10000):
+        self.db = db
+        self.retencao = retencao
+        self.aplicada = None
+        self._epoca = None
+        self._lock = threading.Lock()
+
+    @property
+    def epoca(self):
+        if self._epoca is None:
+            with self.db.engine.begin() as conexao:
+                conexao.execute(text(
+                    "INSERT INTO fila_versao (id, versao, epoca) VALUES (1, 0, :epoca) ON CONFLICT (id) DO NOTHING"
+                ), {'epoca': uuid.uuid4().hex[:8]})
+                self._epoca = conexao.execute(text("SELECT epoca FROM fila_versao WHERE id = 1")).scalar_one()
+        return self._epoca
+
+    def atual(self):
+        self.epoca  # garante que a linha de fila_versao existe
+        with self.db.engine.connect() as conexao:
+            return conexao.execute(text("SELECT versao FROM fila_versao WHERE id = 1")).scalar_one()
+
+    def avancar(self, eventos):
+        """Reserva números para `eventos` (lista de (tipo, id_senha)) e os registra no log."""
+        self.epoca  # garante que a linha de fila_versao existe
+        with self.db.engine.begin() as conexao:
+            ultimo = conexao.execute(text(
+                "UPDATE fila_versao SET versao = versao + :quantidade WHERE id = 1 RETURNING versao"
+            ), {'quantidade': len(eventos)}).scalar_one()
+            primeiro = ultimo - len(eventos) + 1
+            conexao.execute(text(
+                "INSERT INTO fila_eventos_log (seq, tipo, id_senha) VALUES (:seq, :tipo, :id_senha)"
+            ), [{'seq': primeiro + i, 'tipo': tipo, 'id_senha': id_senha} for i, (tipo, id_senha) in enumerate(eventos)])
+            if ultimo // 1000 != (primeiro - 1) // 1000:
+                conexao.execute(text("DELETE FROM fila_eventos_log WHERE seq <= :limite"), {'limite': ultimo - self.retencao})
+        with self._lock:
+            # Só avança a versão aplicada se nenhum outro worker publicou no meio;
+            # caso contrário os eventos dele serão lidos na próxima sincronização.
+            if self.aplicada == primeiro - 1:
+                self.aplicada = ultimo
+        return ultimo
+
+    def novidades(self):
+        """Ids de senhas alteradas por outros workers desde a versão aplicada.
+
+        Devolve None quando a fila em memória precisa ser reconstruída (primeira
+        carga ou log já podado), e uma lista vazia quando não há nada novo.
+        """
+        if self.aplicada is None:
+            return None
+        with self.db.engine.connect() as conexao:
+            linhas = conexao.execute(text(
+                "SELECT seq, id_senha FROM fila_eventos_log WHERE seq > :desde ORDER BY seq"
+            ), {'desde': self.aplicada}).all()
+        if linhas and linhas[0][0] != self.aplicada + 1:
+            return None
+        return linhas
+
+    def marcar_aplicada(self, versao):
+        with self._lock:
+            if self.aplicada is None or versao > self.aplicada:
+                self.aplicada = versao
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useMediaQuery } from 'react-responsive';
 import { LuTicket, LuMonitor, LuUserCircle, LuPhoneCall, LuPause, LuSend, LuCheckCircle, LuWifi, LuWifiOff } from "react-icons/lu";
 import { motion, AnimatePresence } from 'framer-motion';
@@ -9,16 +9,42 @@ import io from 'socket.io-client';
 // Exemplo: const API_BASE_URL = 'https://meu-sistema-fila-prod.herokuapp.com';
 const API_BASE_URL = 'SUA_APP_HEROKU_URL_AQUI';
 
+// Versão do protocolo de eventos incrementais ('fila_eventos') suportada por este cliente.
+const VERSAO_PROTOCOLO = 1;
+
+// Funções auxiliares para aplicar os eventos incrementais nas listas locais.
+// São idempotentes: aplicar o mesmo evento duas vezes não muda o resultado.
+const semSenha = (lista, senha) => lista.filter((s) => s.id_senha !== senha.id_senha);
+const ordenarPorEmissao = (lista) => [...lista].sort((a, b) => (a.data_hora_emissao < b.data_hora_emissao ? -1 : 1));
+
+// Sala do Socket.IO de cada tela: o servidor só envia os eventos do escopo da sala.
+// O monitor pode ser restrito a um serviço com ?servico=<id> na URL.
+const painelDaView = (view) => {
+  if (view === 'atendente') {
+    return { tipo: 'atendente', guiche: 1 }; // Guichê fixo, como nas rotas do atendente
+  }
+  const servico = new URLSearchParams(window.location.search).get('servico');
+  return view === 'monitor' && servico ? { tipo: 'monitor', servico: Number(servico) } : { tipo: view };
+};
+
 const App = () => {
   // --- Estados da Aplicação ---
   const [view, setView] = useState('totem');
   const [fila, setFila] = useState([]);
   const [senhaAtual, setSenhaAtual] = useState(null);
   const [senhasChamadas, setSenhasChamadas] = useState([]);
+  const [estimativas, setEstimativas] = useState({}); // Espera estimada por serviço (de /estado)
   const [isConnected, setIsConnected] = useState(false);
   const [message, setMessage] = useState('');
   const [isLoggedIn, setIsLoggedIn] = useState(false); // Novo estado para controlar o login
   const [localizacao, setLocalizacao] = useState('Guichê 1'); // Novo estado para a localização
+  const ultimoSeq = useRef(null); // Último evento incremental aplicado (null = aguardando snapshot)
+  const epoca = useRef(null); // Identifica a numeração dos eventos (muda quando o servidor reinicia)
+  const pendentes = useRef(new Map()); // Eventos que chegaram antes dos anteriores (seq -> evento)
+  const esperaPendentes = useRef(null); // Timer para desistir de esperar os eventos que faltam
+  const socketRef = useRef(null);
+  const viewRef = useRef(view); // Tela atual, lida pelos listeners do socket
+  const filtroEstado = useRef(''); // Parâmetros de /estado equivalentes à sala inscrita
 
   // Hook para otimização em telas menores
   const isSmallScreen = useMediaQuery({ query: '(max-width: 1023px)' });
@@ -28,14 +54,18 @@ const App = () => {
 
   // --- Efeito para Configurar a Conexão WebSocket ---
   useEffect(() => {
-    // Conecta-se ao servidor Socket.IO
-    const socket = io(API_BASE_URL);
+    // Conecta-se ao servidor Socket.IO. Só com WebSocket: com vários workers atrás do
+    // balanceador, o long-polling exigiria sessões fixas (sticky sessions).
+    const socket = io(API_BASE_URL, { transports: ['websocket'] });
+    socketRef.current = socket;
 
     // Listener para o evento de conexão bem-sucedida
     socket.on('connect', () => {
       console.log('Conectado ao servidor Socket.IO!');
       setIsConnected(true);
       setMessage('Conectado ao servidor!');
+      // Eventos podem ter sido perdidos enquanto estava desconectado: inscreve de novo e recarrega o snapshot.
+      inscrever(viewRef.current);
     });
 
     // Listener para o evento de desconexão
@@ -51,38 +81,159 @@ const App = () => {
       setMessage('Erro de conexão. Verifique o servidor.');
     });
 
-    // Listener para o evento de atualização da fila
-    socket.on('fila_atualizada', (data) => {
-      console.log('Fila atualizada:', data.fila);
-      setFila(data.fila);
-    });
-
-    // Listener para o evento de senha chamada
-    socket.on('senha_chamada', (data) => {
-      console.log('Senha chamada:', data.senha_atual);
-      setSenhaAtual(data.senha_atual);
-      if (data.senhas_chamadas) {
-          setSenhasChamadas(data.senhas_chamadas);
+    // Listener para os eventos incrementais da fila
+    socket.on('fila_eventos', (data) => {
+      if (ultimoSeq.current !== null && data.epoca !== epoca.current) {
+        console.log('Servidor reiniciou a numeração dos eventos, recarregando o estado.');
+        recarregarEstado();
+        return;
       }
+      for (const evento of data.eventos) {
+        if (evento.v !== VERSAO_PROTOCOLO) {
+          console.log('Versão de protocolo desconhecida, recarregando o estado.');
+          recarregarEstado();
+          return;
+        }
+        if (evento.tipo === 'fila_recarregada') {
+          console.log('Fila reconstruída no servidor, recarregando o estado.');
+          recarregarEstado();
+          return;
+        }
+        // Enquanto o snapshot é buscado, guarda tudo; ele decide o que já está refletido
+        if (ultimoSeq.current === null || evento.seq > ultimoSeq.current) {
+          pendentes.current.set(evento.seq, { ...evento, epoca: data.epoca });
+        }
+      }
+      // Eventos fora do escopo da sala chegam só com o número, para não parecerem perdidos
+      for (const seq of data.ignorados || []) {
+        if (ultimoSeq.current === null || seq > ultimoSeq.current) {
+          pendentes.current.set(seq, { seq, epoca: data.epoca, tipo: null });
+        }
+      }
+      aplicarPendentes();
     });
 
-    // Carregar o estado inicial do backend
-    fetchEstadoInicial();
-
     // Função de limpeza para desconectar o socket quando o componente for desmontado
     return () => {
       socket.disconnect();
     };
   }, []);
 
+  // --- Troca de sala ao mudar de tela ---
+  useEffect(() => {
+    viewRef.current = view;
+    if (socketRef.current && socketRef.current.connected) {
+      inscrever(view);
+    }
+  }, [view]);
+
+  // --- Espera estimada no monitor ---
+  // Os eventos não trazem a estimativa: o monitor relê /estado a cada minuto (304 quando nada mudou)
+  useEffect(() => {
+    if (view !== 'monitor') return undefined;
+    const atualizarEstimativas = async () => {
+      try {
+        const response = await fetch(`${API_BASE_URL}/estado${filtroEstado.current}`, { cache: 'no-cache' });
+        const data = await response.json();
+        setEstimativas(data.estimativas || {});
+      } catch (error) {
+        console.error('Erro ao atualizar a espera estimada:', error);
+      }
+    };
+    const intervalo = setInterval(atualizarEstimativas, 60000);
+    return () => clearInterval(intervalo);
+  }, [view]);
+
+  const inscrever = (telaAtual) => {
+    const painel = painelDaView(telaAtual);
+    socketRef.current.emit('inscrever', painel, (resposta) => {
+      if (resposta && resposta.erro) {
+        console.error('Erro ao se inscrever na sala:', resposta.erro);
+        return;
+      }
+      const parametros = new URLSearchParams();
+      if (painel.servico) parametros.set('servico', painel.servico);
+      if (painel.guiche) parametros.set('guiche', painel.guiche);
+      filtroEstado.current = parametros.toString() ? `?${parametros}` : '';
+      recarregarEstado();
+    });
+  };
+
+  // --- Aplicação dos eventos incrementais ---
+  // Com vários workers, eventos de workers diferentes podem chegar fora de ordem.
+  // Os adiantados esperam um pouco pelos que faltam antes de recarregar o estado.
+  const aplicarPendentes = () => {
+    if (ultimoSeq.current === null) {
+      return;
+    }
+    let proximo = pendentes.current.get(ultimoSeq.current + 1);
+    while (proximo) {
+      pendentes.current.delete(proximo.seq);
+      aplicarEvento(proximo);
+      ultimoSeq.current = proximo.seq;
+      proximo = pendentes.current.get(ultimoSeq.current + 1);
+    }
+    clearTimeout(esperaPendentes.current);
+    esperaPendentes.current = null;
+    if (pendentes.current.size > 0) {
+      esperaPendentes.current = setTimeout(() => {
+        console.log('Salto na sequência de eventos, recarregando o estado.');
+        recarregarEstado();
+      }, 1000);
+    }
+  };
+
+  const recarregarEstado = () => {
+    clearTimeout(esperaPendentes.current);
+    esperaPendentes.current = null;
+    pendentes.current.clear();
+    ultimoSeq.current = null;
+    fetchEstadoInicial();
+  };
+
+  const aplicarEvento = ({ tipo, senha }) => {
+    switch (tipo) {
+      case 'senha_adicionada':
+      case 'senha_reencaminhada':
+        setFila((atual) => ordenarPorEmissao([...semSenha(atual, senha), senha]));
+        if (tipo === 'senha_reencaminhada') {
+          setSenhasChamadas((atual) => semSenha(atual, senha));
+          setSenhaAtual((atual) => (atual && atual.id_senha === senha.id_senha ? null : atual));
+        }
+        break;
+      case 'senha_chamada':
+        setFila((atual) => semSenha(atual, senha));
+        setSenhaAtual(senha);
+        setSenhasChamadas((atual) => [senha, ...semSenha(atual, senha)].slice(0, 5));
+        break;
+      case 'senha_finalizada':
+        setSenhasChamadas((atual) => atual.map((s) => (s.id_senha === senha.id_senha ? senha : s)));
+        setSenhaAtual((atual) => (atual && atual.id_senha === senha.id_senha ? null : atual));
+        break;
+      default:
+        break;
+    }
+  };
+
   // --- Funções de API ---
   const fetchEstadoInicial = async () => {
     try {
-        const response = await fetch(`${API_BASE_URL}/estado`);
+        // O navegador revalida com If-None-Match e reaproveita o corpo quando o servidor responde 304
+        const response = await fetch(`${API_BASE_URL}/estado${filtroEstado.current}`, { cache: 'no-cache' });
         const data = await response.json();
         setFila(data.fila);
         setSenhaAtual(data.senha_atual);
         setSenhasChamadas(data.senhas_chamadas);
+        setEstimativas(data.estimativas || {});
+        ultimoSeq.current = data.seq;
+        epoca.current = data.epoca;
+        // Descarta o que o snapshot já reflete e aplica o que chegou enquanto ele era buscado
+        for (const [seq, evento] of pendentes.current) {
+          if (seq <= data.seq || evento.epoca !== data.epoca) {
+            pendentes.current.delete(seq);
+          }
+        }
+        aplicarPendentes();
     } catch (error) {
         console.error('Erro ao buscar o estado inicial:', error);
     }
@@ -102,7 +253,13 @@ const App = () => {
               body: JSON.stringify({ servico, prioritaria, localizacao }),
           });
           const result = await response.json();
-          setMessage(result.mensagem);
+          if (response.ok && result.estimativa) {
+              // Ex.: "Senha A-012 — espera estimada ≈ 8 min"
+              const minutos = result.estimativa.espera_estimada_min;
+              setMessage(`Senha ${result.numero} — espera estimada ${minutos > 0 ? `≈ ${minutos} min` : 'menos de 1 min'}`);
+          } else {
+              setMessage(result.mensagem || result.erro);
+          }
       } catch (error) {
           console.error('Erro ao gerar senha:', error);
           setMessage('Erro ao gerar senha.');
@@ -136,7 +293,13 @@ const App = () => {
           return;
       }
       try {
-          const response = await fetch(`${API_BASE_URL}/finalizar-atendimento`, { method: 'POST' });
+          const response = await fetch(`${API_BASE_URL}/finalizar-atendimento`, {
+              method: 'POST',
+              headers: {
+                  'Content-Type': 'application/json',
+              },
+              body: JSON.stringify({ id_guiche: 1 }), // ID fixo para exemplo
+          });
           const result = await response.json();
           setMessage(result.mensagem);
       } catch (error) {
@@ -151,7 +314,13 @@ const App = () => {
           return;
       }
       try {
-          const response = await fetch(`${API_BASE_URL}/reencaminhar-senha`, { method: 'POST' });
+          const response = await fetch(`${API_BASE_URL}/reencaminhar-senha`, {
+              method: 'POST',
+              headers: {
+                  'Content-Type': 'application/json',
+              },
+              body: JSON.stringify({ id_guiche: 1 }), // ID fixo para exemplo
+          });
           const result = await response.json();
           setMessage(result.mensagem);
       } catch (error) {
@@ -248,6 +417,11 @@ const App = () => {
 
               <motion.div initial={{ opacity: 0, x: 20 }} animate={{ opacity: 1, x: 0 }} className="flex-1 bg-gray-100 dark:bg-gray-700 p-6 rounded-xl shadow-inner">
                   <h3 className="text-2xl font-bold text-gray-800 dark:text-gray-200 mb-4">Próximas na Fila</h3>
+                  {Object.entries(estimativas).map(([nomeServico, estimativa]) => (
+                      <p key={nomeServico} className="text-md text-gray-600 dark:text-gray-400 mb-2">
+                          {nomeServico}: espera estimada {estimativa.espera_estimada_min > 0 ? `≈ ${estimativa.espera_estimada_min} min` : 'menos de 1 min'}
+                      </p>
+                  ))}
                   <div className="max-h-[30vh] overflow-y-auto">
                       <AnimatePresence>
                           {fila.length > 0 ? (